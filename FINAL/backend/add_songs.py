@@ -1,41 +1,98 @@
 import sys
 import os
+import time
 
 # Project root ko Python path me add karo
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+os.environ.setdefault("GESTURE_PREWARM", "0")   # import ke liye hand model nahi chahiye
+
+from sqlalchemy.dialects.sqlite import insert
 from backend.app import app, db
 from backend.models import Song
+from backend.library import AUDIO_EXTS
 
 # ✅ YAHI MAIN CHANGE
 SONG_FOLDER = os.path.join(os.path.dirname(__file__), "music")
+CHUNK = 1000          # rows per INSERT / DELETE batch, one transaction each
+
+
+def iter_song_files(folder):
+    # recursive, one directory at a time; yields "music/<relative path>"
+    stack = [folder]
+    while stack:
+        d = stack.pop()
+        with os.scandir(d) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(AUDIO_EXTS):
+                    rel = os.path.relpath(entry.path, folder).replace(os.sep, "/")
+                    yield f"music/{rel}"
+
+
+def import_songs(folder=SONG_FOLDER, chunk=CHUNK):
+    table = Song.__table__
+    t0 = time.perf_counter()
+
+    # ek hi query: DB me jo paths already hain
+    existing = set(db.session.execute(db.select(table.c.file_path)).scalars())
 
-with app.app_context():
+    # unique index on file_path: a row that slipped in meanwhile is skipped, not duplicated
+    stmt = insert(table).on_conflict_do_nothing(index_elements=["file_path"])
+    seen = set()
+    batch = []
+    added = 0
+    queued = 0      # rows sent to INSERT; queued - added were ON CONFLICT skips
+    scanned = 0
 
-    if not os.path.exists(SONG_FOLDER):
-        print("❌ music folder exist hi nahi karta:", SONG_FOLDER)
-        exit()
+    def flush():
+        nonlocal added
+        if batch:
+            added += db.session.execute(stmt, batch).rowcount or 0
+            db.session.commit()
+            batch.clear()
 
-    files = os.listdir(SONG_FOLDER)
+    for path in iter_song_files(folder):
+        scanned += 1
+        seen.add(path)
+        if path not in existing:
+            queued += 1
+            batch.append({"title": os.path.basename(path), "file_path": path, "liked": False})
+            if len(batch) >= chunk:
+                flush()
+        if scanned % (chunk * 10) == 0:
+            rate = scanned / (time.perf_counter() - t0)
+            print(f"  {scanned} files scanned, {added} added ({rate:.0f} files/s)")
+    flush()
 
-    count = 0
+    # files jo disk se hat gaye, unki rows bhi hatao
+    gone = list(existing - seen)
+    for i in range(0, len(gone), chunk):
+        db.session.execute(table.delete().where(table.c.file_path.in_(gone[i:i + chunk])))
+        db.session.commit()
 
-    for file in files:
-        if file.endswith(".mp3"):
+    elapsed = time.perf_counter() - t0
+    return {
+        "scanned": scanned,
+        "added": added,
+        "removed": len(gone),
+        "unchanged": scanned - queued,
+        "conflicts": queued - added,
+        "seconds": round(elapsed, 2),
+        "files_per_sec": round(scanned / elapsed, 1) if elapsed else None,
+    }
 
-            already = Song.query.filter_by(title=file).first()
-            if already:
-                print("⏩ Already in DB:", file)
-                continue
 
-            song = Song(
-                title=file,
-                file_path=f"music/{file}"   # ✅ yaha bhi change
-            )
+if __name__ == "__main__":
+    with app.app_context():
 
-            db.session.add(song)
-            count += 1
+        if not os.path.exists(SONG_FOLDER):
+            print("❌ music folder exist hi nahi karta:", SONG_FOLDER)
+            exit()
 
-    db.session.commit()
+        report = import_songs()
 
-    print(f"✅ {count} new songs added to database")
+        print(f"✅ {report['added']} new songs added, {report['removed']} removed, "
+              f"{report['unchanged']} already in DB, {report['conflicts']} skipped (added meanwhile) "
+              f"({report['scanned']} files in {report['seconds']}s, {report['files_per_sec']} files/s)")
@@ -1,12 +1,25 @@
-from flask import Flask, request, jsonify, redirect, send_from_directory
+from flask import Flask, Response, request, jsonify, redirect, send_from_directory
 from flask_cors import CORS
-from backend.models import db, User, Song
+from werkzeug.exceptions import NotFound
+from backend.models import db, User, Song, upgrade_schema
 from backend.player import MusicPlayer 
 from backend.spotify_control import SpotifyController
+from backend.library import Library, PAGE_LIMIT
+from backend.streaming import send_audio
+from backend.transcode import Transcoder
 import os , sys
+import json
+import queue
 import threading
-from backend.gesture_control import start_gesture, stop_gesture
-from backend.voice_control import start_voice, stop_voice
+from backend.command_bus import bus
+from backend import command_bus as cb
+from backend.gesture_control import start_gesture, stop_gesture, gesture_stats
+from backend.gesture_control import prewarm_landmarker, release_landmarker
+from backend.gesture_control import start_recording, stop_recording
+from backend.gesture_control import gesture_running, subscribe as on_gesture_change
+from backend.frame_source import client_source
+from backend.voice_control import start_voice, stop_voice, voice_status, voice_stats
+from backend.voice_control import set_active as set_voice_active, subscribe as on_voice_change
 import pygame
 
 # ---------------- DATABASE ----------------
@@ -25,17 +38,19 @@ db.init_app(app)
 
 with app.app_context():
     db.create_all()
+    upgrade_schema()
 
 # ---------------- MUSIC FOLDER ----------------
 MUSIC_FOLDER = os.path.join(BASE_DIR, "music")
 os.makedirs(MUSIC_FOLDER, exist_ok=True)
 
-# Load local songs
-local_songs = [
-    os.path.join(MUSIC_FOLDER, f)
-    for f in os.listdir(MUSIC_FOLDER)
-    if f.endswith(".mp3")
-]
+# Scanned once (recursively), then kept up to date in the background.
+# library.snapshot is what both the player and /api/songs read.
+library = Library(MUSIC_FOLDER)
+library.start()
+
+# ?quality=low variants, built on first request and cached on disk
+transcoder = Transcoder(MUSIC_FOLDER)
 
 # ---------------- SPOTIFY ----------------
 spotify_ctrl = SpotifyController(
@@ -46,7 +61,7 @@ spotify_ctrl = SpotifyController(
 
 # ---------------- PLAYER ----------------
 player = MusicPlayer(
-    local_songs=local_songs,
+    library=library,
     spotify_controller=spotify_ctrl
 )
 
@@ -63,7 +78,102 @@ player_state = {
 gesture_thread = None
 voice_thread = None
 
-gesture_running = False
+# load the hand model in the background so the first gesture start is warm
+if os.environ.get("GESTURE_PREWARM", "1") == "1":
+    prewarm_landmarker()
+
+# status / mode shown in /api/state after each command, whatever its source
+COMMAND_STATE = {
+    cb.PLAY: ("playing", "local"),
+    cb.PLAY_INDEX: ("playing", "local"),
+    cb.PLAY_BY_NAME: ("playing", "local"),
+    cb.NEXT: ("playing", "local"),
+    cb.PREV: ("playing", "local"),
+    cb.PAUSE: ("paused", "local"),
+    cb.VOLUME_UP: ("volumed up", "local"),
+    cb.VOLUME_DOWN: ("volumed down", "local"),
+    cb.LIKE: ("liked", "local"),
+    cb.DISLIKE: ("disliked", "local"),
+    cb.SPOTIFY_PLAY: ("playing", "spotify"),
+    cb.SPOTIFY_STOP: ("paused", "spotify"),
+    cb.SPOTIFY_NEXT: ("next song", "spotify"),
+    cb.SPOTIFY_PREV: ("previous song", "spotify"),
+}
+
+# ---------------- EVENTS (SSE) ----------------
+# every state change is pushed to /api/events subscribers, so the UI no
+# longer has to poll /api/state to notice a track change
+EVENT_QUEUE = 64          # per client; a slow client loses its oldest events
+EVENT_HEARTBEAT = 15      # seconds between keep-alive comments
+_event_clients = []
+_event_lock = threading.Lock()
+
+def current_state():
+    return {
+        "mode": player_state["mode"],
+        "status": player_state["status"],
+
+        # 🔥 MAIN FIX FOR HIGHLIGHT
+        "current_index": player.current_index if hasattr(player, "current_index") else 0,
+
+        # voice + gesture
+        "voice": voice_status.get("active", False),
+        "gesture": gesture_running()
+    }
+
+def _sse(event):
+    return f"event: {event}\ndata: {json.dumps(current_state())}\n\n"
+
+def broadcast(event="state"):
+    payload = _sse(event)
+    with _event_lock:
+        clients = list(_event_clients)
+    for q in clients:
+        try:
+            q.put_nowait(payload)
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                pass    # another producer refilled it; this client is lagging anyway
+
+def _apply_state(cmd):
+    if cmd.name == cb.LIBRARY_CHANGED:
+        broadcast()     # current_index may have moved with the song list
+        return
+    if cmd.name in (cb.PLAY_INDEX, cb.PLAY_BY_NAME) and cmd.result is None:
+        return
+    player_state["status"], player_state["mode"] = COMMAND_STATE[cmd.name]
+    broadcast()
+
+def _track_event(event, data):
+    # player thread: a track ended and the next one started (or nothing did)
+    player_state["status"] = "playing" if data["playing"] else "stopped"
+    player_state["mode"] = "local"
+    player_state["song"] = data["song"] or ""
+    broadcast(event)
+
+bus.subscribe(_apply_state)
+player.subscribe(_track_event)
+# wake word heard / voice off / gesture session up or down, from their own threads
+on_voice_change(lambda active: broadcast())
+on_gesture_change(lambda running: broadcast())
+player.start_worker(bus)
+
+def dispatch(command, message, extra=None, **args):
+    # thin HTTP adapter: same bus the gesture/voice threads publish to.
+    # Returns straight away; poll /api/command/<ticket> for the outcome.
+    cmd = bus.publish(command, source="api", **args)
+    body = {"message": message, "ticket": cmd.id, "state": cmd.state}
+    body.update(extra or {})
+    if cmd.state == cb.DROPPED:
+        return jsonify(body), 503
+    return jsonify(body), 202
+
 voice_running = False
 
 # ---------------- BASIC ROUTE ----------------
@@ -77,14 +187,52 @@ def serve_react(path):
 # Route to serve individual songs
 @app.route("/songs/<path:filename>")
 def serve_song(filename):
-    return send_from_directory(MUSIC_FOLDER, filename)
+    # ranges (seeking), ETag/Last-Modified and sendfile where the server has it.
+    # ?quality=low|medium serves a cached lower-bitrate variant when ffmpeg
+    # has one ready, else the original
+    quality = request.args.get("quality")
+    if quality:
+        try:
+            variant = transcoder.get(filename, quality)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if variant:
+            try:
+                return send_audio(transcoder.cache_dir, variant)
+            except NotFound:
+                pass        # evicted since get() returned it: serve the original
+        # stand-in for a variant that is not ready: never let a browser / CDN
+        # keep it under the ?quality= URL, or the variant never shows up
+        return send_audio(MUSIC_FOLDER, filename, max_age=0)
+    return send_audio(MUSIC_FOLDER, filename)
 
 # ---------------- SONG LIST ----------------
 @app.route("/api/songs", methods=["GET"])
 def get_local_songs():
-    files = os.listdir(MUSIC_FOLDER)
-    songs = [f for f in files if f.endswith(".mp3") or f.endswith(".wav")]
-    return jsonify({"songs": songs})
+    # ?q=&sort=index|name|-name&limit=&cursor=  (cursor = next_cursor of the previous page)
+    # Every song carries its player index, whatever the filter / sort.
+    # Pages are serialised (and gzipped) once per library version.
+    try:
+        etag, body, gz = library.snapshot.page(
+            q=request.args.get("q", "").strip(),
+            sort=request.args.get("sort", "index"),
+            cursor=request.args.get("cursor") or None,
+            limit=request.args.get("limit", PAGE_LIMIT),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # each encoding is a different representation, so it gets its own tag
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if gz is not None and "gzip" in request.accept_encodings:
+        etag += "-gz"
+        headers["Content-Encoding"] = "gzip"
+        body = gz
+    headers["ETag"] = f'"{etag}"'
+    if etag in request.if_none_match:
+        headers.pop("Content-Encoding", None)
+        return app.response_class(status=304, headers=headers)
+    return app.response_class(body, mimetype="application/json", headers=headers)
 
 # ---------------- AUTH ----------------
 @app.route("/api/signup", methods=["POST"])
@@ -132,159 +280,165 @@ def current_index():
 
 @app.route("/api/state", methods=["GET"])
 def get_state():
-    return jsonify({
-        "mode": player_state["mode"],
-        "status": player_state["status"],
+    return jsonify(current_state())
 
-        # 🔥 MAIN FIX FOR HIGHLIGHT
-        "current_index": player.current_index if hasattr(player, "current_index") else 0,
+@app.route("/api/events")
+def events():
+    # Server-Sent Events: current state first, then one message per change
+    q = queue.Queue(maxsize=EVENT_QUEUE)
+    q.put_nowait(_sse("state"))
+    with _event_lock:
+        _event_clients.append(q)
 
-        # voice + gesture
-        "voice": voice_status.get("active", False),
-        "gesture": False
-    })
+    def stream():
+        try:
+            while True:
+                try:
+                    yield q.get(timeout=EVENT_HEARTBEAT)
+                except queue.Empty:
+                    yield ": ping\n\n"
+        finally:
+            with _event_lock:
+                _event_clients.remove(q)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 
 # ---------------- LOCAL PLAYER CONTROLS ----------------
 @app.route("/api/play", methods=["POST"])
 def play():
-    player.play()
-    player_state["status"] = "playing"
-    player_state["mode"] = "local"
-    return jsonify({"message": "Playing local song"}), 200
+    return dispatch(cb.PLAY, "Playing local song")
 
 @app.route("/api/play_by_name", methods=["POST"])
 def play_by_name():
     data = request.get_json()
     name = data.get("name", "").lower().strip()
 
-    # ----- SPECIAL COMMANDS -----
-    if name == "last song":
-        player.current_index = len(local_songs) - 1
-        player.play()
-        return jsonify({"message": "playing last song"})
-
-    if name == "first song":
-        player.current_index = 0
-        player.play()
-        return jsonify({"message": "playing first song"})
-
-    if name == "random song":
-        import random
-        player.current_index = random.randint(0, len(local_songs)-1)
-        player.play()
-        return jsonify({"message": "playing random song"})
-    # ----- FUZZY + HALF MATCH -----
-    best_index = None
-
-    for i, song in enumerate(local_songs):
-        base = os.path.basename(song).lower()
-
-        clean = base.replace(".mp3","").replace("_"," ").replace("-"," ")
-        # exact / partial match
-        if name in clean:
-            best_index = i
-            break
-
-        # fuzzy replace
-        if name.replace("a","aa") in clean or name.replace("aa","a") in clean:
-            best_index = i
-            break
-    if best_index is not None:
-        player.current_index = best_index
-        player.play()
-
-        return jsonify({
-            "message": "playing",
-            "index": best_index,
-            "song": os.path.basename(local_songs[best_index])
-        })
-    return jsonify({"error": "song not found"}), 404
+    # result (index, or null if nothing matched) lands on the ticket
+    return dispatch(cb.PLAY_BY_NAME, "playing", name=name)
 
 @app.route("/api/play_index", methods=["POST"])
 def play_index():
     data = request.get_json()
     index = int(data.get("index"))
+    songs = library.snapshot.songs
 
     # ✅ Sahi list use karo
-    if index < 0 or index >= len(local_songs):
+    if index < 0 or index >= len(songs):
         return jsonify({"error": "invalid index"})
 
-    # ✅ MusicPlayer ka index set
-    player.current_index = index
-
-    # ✅ Existing player ka play function use karo
-    player.play()
-
-    player_state["status"] = "playing"
-    player_state["mode"] = "local"
-
-    return jsonify({
-        "msg": "playing",
+    # ✅ Player thread hi index set karke play karega
+    return dispatch(cb.PLAY_INDEX, "playing", extra={
         "index": index,
-        "song": os.path.basename(local_songs[index])
-    })
+        "song": os.path.basename(songs[index])
+    }, index=index)
+
+# ---------------- PLAY QUEUE ----------------
+# edits go straight to player.queue (it has its own lock); the player
+# thread picks the new "next" up on its next tick
+def _queue_item(item, snap):
+    i = snap.positions.get(item["path"])
+    return {"id": item["id"], "index": i, "name": snap.names[i] if i is not None else None}
+
+@app.route("/api/queue", methods=["GET"])
+def get_queue():
+    # ?offset=&limit=
+    try:
+        page = player.queue.page(request.args.get("offset", 0), request.args.get("limit", PAGE_LIMIT))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    snap = library.snapshot
+    page["items"] = [_queue_item(item, snap) for item in page["items"]]
+    return jsonify(page)
+
+@app.route("/api/queue/add", methods=["POST"])
+def queue_add():
+    # {"index": i} or {"indices": [...]}, "next": true = play after the current song
+    data = request.get_json() or {}
+    songs = library.snapshot.songs
+    indices = data.get("indices", [data.get("index")])
+    try:
+        paths = [songs[int(i)] for i in indices]
+    except (TypeError, ValueError, IndexError):
+        return jsonify({"error": "invalid index"}), 400
+    after = player.queue.current if data.get("next") else None
+    ids = player.queue.extend(paths, after=after)
+    broadcast("queue")
+    return jsonify({"ids": ids, "total": len(player.queue)})
+
+@app.route("/api/queue/remove", methods=["POST"])
+def queue_remove():
+    data = request.get_json() or {}
+    try:
+        player.queue.remove(data.get("id"))
+    except KeyError:
+        return jsonify({"error": "unknown queue entry"}), 404
+    broadcast("queue")
+    return jsonify({"total": len(player.queue)})
+
+@app.route("/api/queue/move", methods=["POST"])
+def queue_move():
+    # {"id": e, "after": other id (0 = front)} or {"id": e, "position": p}
+    data = request.get_json() or {}
+    try:
+        player.queue.move(data.get("id"), after=data.get("after"), position=data.get("position"))
+    except KeyError:
+        return jsonify({"error": "unknown queue entry"}), 404
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid position"}), 400
+    broadcast("queue")
+    return jsonify({"ok": True})
+
+@app.route("/api/queue/shuffle", methods=["POST"])
+def queue_shuffle():
+    data = request.get_json() or {}
+    player.queue.set_shuffle(data.get("on", not player.queue.shuffle))
+    broadcast("queue")
+    return jsonify({"shuffle": player.queue.shuffle})
+
+@app.route("/api/queue/play", methods=["POST"])
+def queue_play():
+    # play one queue entry; the player thread does the actual load
+    data = request.get_json() or {}
+    try:
+        path = player.queue.jump(data.get("id"))
+    except KeyError:
+        return jsonify({"error": "unknown queue entry"}), 404
+    index = library.snapshot.positions.get(path)
+    if index is None:
+        return jsonify({"error": "song no longer in library"}), 404
+    return dispatch(cb.PLAY_INDEX, "playing", extra={"index": index}, index=index)
 
 @app.route("/api/pause", methods=["POST"])
 def pause():
-    player.pause()
-    player_state["status"] = "paused"
-    player_state["mode"] = "local"
-    return jsonify({"message": "Paused"}), 200
+    return dispatch(cb.PAUSE, "Paused")
 
 @app.route("/api/next", methods=["POST"])
 def next_song():
-    player.next_song()
-
-    player_state["status"] = "playing"
-    player_state["mode"] = "local"
-
-    return jsonify({
-        "message": "Next song",
-        "current_index": player.current_index
-    }), 200
+    return dispatch(cb.NEXT, "Next song")
 
 @app.route("/api/prev", methods=["POST"])
 def prev_song():
-    player.prev_song()
-
-    player_state["status"] = "playing"
-    player_state["mode"] = "local"
-
-    return jsonify({
-        "message": "Previous song",
-        "current_index": player.current_index
-    }), 200
+    return dispatch(cb.PREV, "Previous song")
 
 
 @app.route("/api/volume_up", methods=["POST"])
 def volume_up():
-    player.volume_up()
-    player_state["status"] = "volumed up"
-    player_state["mode"] = "local"
-    return jsonify({"message": "Volume up"}), 200
+    return dispatch(cb.VOLUME_UP, "Volume up")
 
 @app.route("/api/volume_down", methods=["POST"])
 def volume_down():
-    player.volume_down()
-    player_state["status"] = "volumed down"
-    player_state["mode"] = "local"
-    return jsonify({"message": "Volume down"}), 200
+    return dispatch(cb.VOLUME_DOWN, "Volume down")
 
 @app.route("/api/like", methods=["POST"])
 def like():
-    player.like()
-    player_state["status"] = "liked"
-    player_state["mode"] = "local"
-    return jsonify({"message": "Liked"}), 200
+    return dispatch(cb.LIKE, "Liked")
 
 @app.route("/api/dislike", methods=["POST"])
 def dislike():
-    player.dislike()
-    player_state["status"] = "disliked"
-    player_state["mode"] = "local"
-    return jsonify({"message": "Disliked"}), 200
+    return dispatch(cb.DISLIKE, "Disliked")
 
 # ---------------- SPOTIFY CONTROLS ----------------
 @app.route("/api/spotify/login")
@@ -305,44 +459,49 @@ def spotify_callback():
 def spotify_play():
     if not spotify_ctrl.is_ready():
         return jsonify({"error": "Spotify not logged in"}), 401
-    player.play_spotify()
-    player_state["status"] = "playing"
-    player_state["mode"] = "spotify"
-    return jsonify({"message": "Spotify playing"}), 200
+    return dispatch(cb.SPOTIFY_PLAY, "Spotify playing")
 
 
 @app.route("/api/spotify/stop", methods=["POST"])
 def spotify_stop():
     if not spotify_ctrl.is_ready():
         return jsonify({"error": "Spotify not logged in"}), 401
-    player.stop_spotify()
-    player_state["status"] = "paused"
-    player_state["mode"] = "spotify"
-    return jsonify({"message": "Spotify stopped"}), 200
+    return dispatch(cb.SPOTIFY_STOP, "Spotify stopped")
 
 @app.route("/api/spotify/next", methods=["POST"])
 def spotify_next():
     if not spotify_ctrl.is_ready():
         return jsonify({"error": "Spotify not logged in"}), 401
-    player.next_spotify()
-    player_state["status"] = "next song"
-    player_state["mode"] = "spotify"
-    return jsonify({"message": "Spotify next"}), 200
+    return dispatch(cb.SPOTIFY_NEXT, "Spotify next")
 
 @app.route("/api/spotify/prev", methods=["POST"])
 def spotify_prev():
     if not spotify_ctrl.is_ready():
         return jsonify({"error": "Spotify not logged in"}), 401
-    player.prev_spotify()
-    player_state["status"] = "previous song"
-    player_state["mode"] = "spotify"
-    return jsonify({"message": "Spotify previous"}), 200
+    return dispatch(cb.SPOTIFY_PREV, "Spotify previous")
 
 
 # gesture and voice api routes
 @app.route("/api/gesture/start", methods=["POST"])
 def gesture_start_route():
-    start_gesture_thread = threading.Thread(target=start_gesture, daemon=True)
+    # optional body: {"headless": true, "preview_fps": 10, "source": "camera:1"}
+    # source over HTTP: a camera index, or a file / image dir under GESTURE_MEDIA_ROOT
+    data = request.get_json(silent=True) or {}
+    source = data.get("source")
+    if source is not None:
+        try:
+            source = client_source(source)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    start_gesture_thread = threading.Thread(
+        target=start_gesture,
+        kwargs={
+            "headless_mode": data.get("headless"),
+            "fps": data.get("preview_fps"),
+            "source": source,
+        },
+        daemon=True
+    )
     start_gesture_thread.start()
     return "", 200
 
@@ -351,37 +510,97 @@ def gesture_stop_route():
     stop_gesture()
     return "", 200
 
+# record the landmark stream to an .npz fixture for gesture_replay.py
+@app.route("/api/gesture/record/start", methods=["POST"])
+def gesture_record_start():
+    start_recording()
+    return {"status": "recording"}, 200
+
+@app.route("/api/gesture/record/stop", methods=["POST"])
+def gesture_record_stop():
+    path = stop_recording()
+    if path is None:
+        return {"error": "nothing recorded"}, 400
+    return {"status": "saved", "path": path}, 200
+
+# per-stage fps / latency of the capture -> inference -> preview pipeline
+@app.route("/api/gesture/stats")
+def gesture_stats_route():
+    return jsonify(gesture_stats())
+
 
-voice_status = {"active":False}
 @app.route("/api/voice/start", methods=["POST"])
 def voice_start_route():
-    start_voice()
-    voice_status["active"] = True
+    # optional body: {"backend": "vosk"}; song titles become the local engines' vocabulary
+    data = request.get_json(silent=True) or {}
+    titles = [
+        os.path.splitext(os.path.basename(s))[0].replace("_", " ").replace("-", " ")
+        for s in library.snapshot.songs
+    ]
+    try:
+        start_voice(data.get("backend"), vocabulary=titles)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    set_voice_active(True)
     return {"status":"voice started"}, 200
 
 @app.route("/api/voice/stop", methods=["POST"])
 def voice_stop_route():
     stop_voice()
-    voice_status["active"] = False
+    set_voice_active(False)
     return {"status":"voice stopped"}, 200
 
 @app.route("/api/voice_active", methods=["POST"])
 def voice_active():
-    voice_status["active"] = True
+    set_voice_active(True)
     print("🎤 Voice wake word detected")
     return {"status": "voice active"}
 
 @app.route("/api/voice_inactive", methods=["POST"])
 def voice_inactive():
-    voice_status["active"] = False
+    set_voice_active(False)
     return {"active": False}
 
 @app.route("/api/voice_status")
 def get_voice_status():
     return voice_status
 
+@app.route("/api/voice/stats")
+def voice_stats_route():
+    return jsonify(voice_stats())
+
+@app.route("/api/command/<int:ticket>")
+def command_status(ticket):
+    cmd = bus.ticket(ticket)
+    if cmd is None:
+        return jsonify({"error": "unknown ticket"}), 404
+    return jsonify(cmd.ticket())
+
+# command bus latency (input seen -> player done), per source
+@app.route("/api/bus/stats")
+def bus_stats():
+    return jsonify(bus.stats())
+
+@app.route("/api/library/stats")
+def library_stats():
+    return jsonify(library.stats())
+
+@app.route("/api/transcode/stats")
+def transcode_stats():
+    return jsonify(transcoder.stats())
+
+@app.route("/api/player/stats")
+def player_stats():
+    return jsonify(player.stats())
+
 @app.route('/shutdown', methods=['POST'])
 def shutdown():
+    stop_gesture()
+    release_landmarker()
+    library.stop()
+    transcoder.shutdown()
+    if player.queue.file:
+        player.queue.save(player._name)
     os._exit(0)
     return "ok"
 
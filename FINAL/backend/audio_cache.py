@@ -0,0 +1,141 @@
+# backend/audio_cache.py
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+# ---------------- CONFIG ----------------
+CACHE_BYTES = int(os.environ.get("AUDIO_CACHE_MB", 256)) * 1024 * 1024
+MAX_ITEM_BYTES = int(os.environ.get("PRELOAD_MAX_MB", 64)) * 1024 * 1024   # bigger files stay on disk
+
+
+class AudioCache:
+    # Byte-budgeted LRU of whole audio files, keyed by path. Entries carry
+    # the (size, mtime) they were read at, so a file replaced on disk is a
+    # miss rather than stale audio. get() is what counts hits/misses;
+    # contains() is a free peek for the read-ahead logic. A single warm-up
+    # thread reads files in the background so a miss never blocks the player.
+
+    def __init__(self, budget=CACHE_BYTES, max_item=MAX_ITEM_BYTES):
+        self.budget = budget
+        self.max_item = min(max_item, budget)
+        self._items = OrderedDict()      # path -> (stamp, bytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def fits(self, path):
+        try:
+            return os.path.getsize(path) <= self.max_item
+        except OSError:
+            return False
+
+    def contains(self, path):
+        with self._lock:
+            return path in self._items
+
+    def get(self, path):
+        # -> bytes or None; a hit moves the entry to the young end
+        try:
+            stamp = self._stamp(path)
+        except OSError:
+            stamp = None
+        with self._lock:
+            entry = self._items.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._items.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._drop(path)
+            self.misses += 1
+            return None
+
+    def put(self, path, stamp, data):
+        if len(data) > self.max_item:
+            return False
+        with self._lock:
+            if path in self._items:
+                self._drop(path)
+            self._items[path] = (stamp, data)
+            self.bytes += len(data)
+            while self.bytes > self.budget:
+                old, _ = next(iter(self._items.items()))
+                self._drop(old)
+                self.evictions += 1
+        return True
+
+    def _drop(self, path):
+        _, data = self._items.pop(path)
+        self.bytes -= len(data)
+
+    def discard(self, path):
+        with self._lock:
+            if path in self._items:
+                self._drop(path)
+
+    def read(self, path):
+        # read-through on the calling thread; None if too big or unreadable
+        try:
+            stamp = self._stamp(path)
+            if stamp[0] > self.max_item:
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            print("Audio cache read failed:", path, e)
+            return None
+        self.put(path, stamp, data)
+        return data
+
+    # ---------- background warm-up ----------
+    def warm(self, path):
+        # queue path to be read into the cache; no-op if already there
+        if path is None or self.contains(path):
+            return
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._warm_loop, daemon=True)
+                self._thread.start()
+        self._queue.put(path)
+
+    def _warm_loop(self):
+        while True:
+            path = self._queue.get()
+            try:
+                if not self.contains(path) and self.fits(path):
+                    self.read(path)
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+
+    def pending(self, path):
+        with self._lock:
+            return path in self._pending
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "bytes": self.bytes,
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "pending": len(self._pending),
+            }
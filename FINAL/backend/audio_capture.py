@@ -0,0 +1,212 @@
+# backend/audio_capture.py
+import threading
+import numpy as np
+import sounddevice as sd
+
+# ---------------- CONFIG ----------------
+SAMPLE_RATE = 16000
+FRAME_MS = 30                     # VAD decision granularity
+FRAME = SAMPLE_RATE * FRAME_MS // 1000
+RING_SECONDS = 10                 # audio kept for pre-roll / look-back
+
+SPEECH_MARGIN_DB = 10.0           # frame is voiced this far above the noise floor
+MIN_SPEECH_DB = 35.0              # ... and at least this loud (dB re 1 LSB of int16)
+START_FRAMES = 3                  # voiced frames in a row that open an utterance
+HANGOVER_FRAMES = 10              # silent frames (300 ms) that close it
+PRE_ROLL_FRAMES = 10              # audio kept from before the speech started
+MAX_UTTERANCE_FRAMES = 200        # hard cut at 6 s
+NOISE_RISE = 0.02                 # noise floor EMA while it rises (slow)
+NOISE_FALL = 0.2                  # ... and while it falls (fast)
+WAKE_ARMED_SECONDS = 4.0          # after "kiki", the next utterance needs no wake word
+
+
+class AudioRing:
+    # Fixed-size int16 ring addressed by absolute sample number, so readers
+    # can ask for "samples 48000..52000" as long as they are still in it.
+
+    def __init__(self, seconds=RING_SECONDS, rate=SAMPLE_RATE):
+        self.size = seconds * rate
+        self._buf = np.zeros(self.size, np.int16)
+        self.written = 0
+        self._cond = threading.Condition()
+
+    def write(self, samples):
+        n = len(samples)
+        with self._cond:
+            start = self.written % self.size
+            end = start + n
+            if end <= self.size:
+                self._buf[start:end] = samples
+            else:
+                split = self.size - start
+                self._buf[start:] = samples[:split]
+                self._buf[:n - split] = samples[split:]
+            self.written += n
+            self._cond.notify_all()
+
+    def read(self, start, end):
+        with self._cond:
+            start = max(start, self.written - self.size)
+            end = min(end, self.written)
+            if end <= start:
+                return np.zeros(0, np.int16)
+            idx = np.arange(start, end) % self.size
+            return self._buf[idx].copy()
+
+    def wait_for(self, position, timeout=None):
+        # block until `position` samples have been written
+        with self._cond:
+            return self._cond.wait_for(lambda: self.written >= position, timeout)
+
+
+class VoiceActivityDetector:
+    # Frame-level energy VAD with an incrementally tracked noise floor.
+    # feed(frame_index, samples) returns (start, end) frame indices when an
+    # utterance has just ended, else None.
+
+    def __init__(self):
+        self.noise_db = None
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._start = None
+
+    @staticmethod
+    def energy_db(samples):
+        rms = np.sqrt(np.mean(np.square(samples, dtype=np.float64))) if len(samples) else 0.0
+        return 20 * np.log10(rms + 1.0)
+
+    def is_speech(self, db):
+        return db > max(self.noise_db + SPEECH_MARGIN_DB, MIN_SPEECH_DB)
+
+    def feed(self, index, samples):
+        db = self.energy_db(samples)
+        if self.noise_db is None:
+            self.noise_db = db
+        speech = self.is_speech(db)
+
+        if not speech:
+            # floor follows quiet frames: quickly down, slowly up
+            rate = NOISE_FALL if db < self.noise_db else NOISE_RISE
+            self.noise_db += rate * (db - self.noise_db)
+
+        if self._start is None:
+            self._voiced_run = self._voiced_run + 1 if speech else 0
+            if self._voiced_run >= START_FRAMES:
+                self._start = index - START_FRAMES + 1
+                self._silent_run = 0
+            return None
+
+        self._silent_run = 0 if speech else self._silent_run + 1
+        length = index - self._start + 1
+        if self._silent_run >= HANGOVER_FRAMES or length >= MAX_UTTERANCE_FRAMES:
+            start, end = self._start, index - self._silent_run + 1
+            self._start = None
+            self._voiced_run = 0
+            return start, end
+        return None
+
+    @property
+    def in_speech(self):
+        return self._start is not None
+
+
+class MicStream:
+    # One always-open microphone stream. The PortAudio callback only copies
+    # into the ring; utterances() walks the ring frame by frame on the
+    # caller's thread, runs the VAD and yields voiced PCM segments.
+    # With a wake-word spotter, frames also go through it and only speech
+    # that follows a "kiki" hit is yielded; everything else is dropped here,
+    # before any recognizer sees it.
+
+    def __init__(self, device=None, rate=SAMPLE_RATE, spotter=None):
+        self.rate = rate
+        self.device = device
+        self.ring = AudioRing(rate=rate)
+        self.vad = VoiceActivityDetector()
+        self.spotter = spotter
+        self.overflows = 0
+        self.utterances_emitted = 0
+        self.utterances_gated = 0
+        self._wake_at = None          # sample where the last wake word ended
+        self._armed_until = -1
+        self._stream = None
+        self._running = False
+
+    def _callback(self, indata, frames, time_info, status):
+        if status.input_overflow:
+            self.overflows += 1
+        self.ring.write(indata[:, 0])
+
+    def start(self):
+        if self._stream is not None:
+            return
+        self._running = True
+        self._stream = sd.InputStream(
+            samplerate=self.rate, channels=1, dtype="int16",
+            blocksize=FRAME, device=self.device, callback=self._callback
+        )
+        self._stream.start()
+
+    def stop(self):
+        self._running = False
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _wake_gate(self, start, end):
+        # -> first sample to recognise, or None to drop the segment
+        wake = self._wake_at
+        if wake is not None and start <= wake <= end:
+            self._wake_at = None
+            return wake
+        if start < self._armed_until:
+            return start
+        return None
+
+    def utterances(self):
+        # yields (pcm_bytes, start_sample, woke) for each voiced segment;
+        # woke is None without a spotter (caller looks for the wake word in
+        # the text), True when the spotter heard it and pcm starts after it
+        index = self.ring.written // FRAME
+        while self._running:
+            if not self.ring.wait_for((index + 1) * FRAME, timeout=0.5):
+                continue
+            if self.ring.written - index * FRAME > self.ring.size:
+                # consumer fell a whole ring behind; skip to live audio
+                index = self.ring.written // FRAME
+                continue
+            samples = self.ring.read(index * FRAME, (index + 1) * FRAME)
+            segment = self.vad.feed(index, samples)
+            if self.spotter is not None:
+                lag = self.spotter.feed(samples, check=self.vad.in_speech)
+                if lag is not None:
+                    self._wake_at = (index + 1) * FRAME - lag
+                    self._armed_until = self._wake_at + int(WAKE_ARMED_SECONDS * self.rate)
+            index += 1
+            if segment is None:
+                continue
+            start, end = segment
+            start = max(0, start - PRE_ROLL_FRAMES) * FRAME
+            end = end * FRAME
+            woke = None
+            if self.spotter is not None:
+                begin = self._wake_gate(start, end)
+                if begin is None:
+                    self.utterances_gated += 1
+                    continue
+                start, woke = begin, True
+            pcm = self.ring.read(start, end)
+            self.utterances_emitted += 1
+            yield pcm.tobytes(), start, woke
+
+    def stats(self):
+        return {
+            "noise_floor_db": round(float(self.vad.noise_db), 1) if self.vad.noise_db is not None else None,
+            "in_speech": self.vad.in_speech,
+            "utterances": self.utterances_emitted,
+            "gated": self.utterances_gated,
+            "wake_word": self.spotter.stats() if self.spotter else None,
+            "overflows": self.overflows,
+            "buffered_s": round(min(self.ring.written, self.ring.size) / self.rate, 1),
+        }
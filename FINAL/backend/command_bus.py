@@ -0,0 +1,210 @@
+# backend/command_bus.py
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+# ---------------- COMMANDS ----------------
+# Every action the player understands. Gesture, voice and HTTP all publish
+# these names, so a typo fails at publish time instead of silently later.
+PLAY = "play"
+PAUSE = "pause"
+NEXT = "next"
+PREV = "prev"
+PLAY_INDEX = "play_index"
+PLAY_BY_NAME = "play_by_name"
+VOLUME_UP = "volume_up"
+VOLUME_DOWN = "volume_down"
+LIKE = "like"
+DISLIKE = "dislike"
+SPOTIFY_PLAY = "spotify_play"
+SPOTIFY_STOP = "spotify_stop"
+SPOTIFY_NEXT = "spotify_next"
+SPOTIFY_PREV = "spotify_prev"
+LIBRARY_CHANGED = "library_changed"   # library thread -> player: new snapshot to adopt
+
+COMMANDS = frozenset([
+    PLAY, PAUSE, NEXT, PREV, PLAY_INDEX, PLAY_BY_NAME,
+    VOLUME_UP, VOLUME_DOWN, LIKE, DISLIKE,
+    SPOTIFY_PLAY, SPOTIFY_STOP, SPOTIFY_NEXT, SPOTIFY_PREV,
+    LIBRARY_CHANGED,
+])
+
+LATENCY_WINDOW = 200   # last N commands kept per source for stats
+QUEUE_SIZE = 64        # pending commands before publish starts dropping
+TICKET_HISTORY = 500   # finished commands still answerable by ticket
+
+# runs of these fold into one player call (see coalesce)
+SKIP_STEPS = {NEXT: 1, PREV: -1}
+VOLUME_STEPS = {VOLUME_UP: 1, VOLUME_DOWN: -1}
+LAST_WINS = frozenset([PLAY_INDEX, LIBRARY_CHANGED])
+
+# ticket states
+QUEUED = "queued"
+DONE = "done"
+COALESCED = "coalesced"
+FAILED = "failed"
+DROPPED = "dropped"
+
+
+class Command:
+    __slots__ = ("id", "name", "args", "source", "created", "done",
+                 "state", "result", "error")
+
+    def __init__(self, id, name, args, source, created):
+        self.id = id
+        self.name = name
+        self.args = args
+        self.source = source          # api / gesture / voice
+        self.created = created        # perf_counter() when the input was seen
+        self.done = threading.Event()
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def ticket(self):
+        return {
+            "ticket": self.id,
+            "command": self.name,
+            "source": self.source,
+            "state": self.state,
+            "result": self.result,
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return f"Command({self.id}, {self.name!r}, {self.args!r}, source={self.source!r})"
+
+
+def coalesce(cmds):
+    # Fold a drained batch into as few player calls as possible, keeping order:
+    #   next x5            -> ("skip", {"offset": 5})
+    #   vol+ vol+ vol-     -> ("volume", {"steps": 1})
+    #   play_index a, b    -> play_index b
+    #   pause pause        -> pause
+    # Returns [(action, args, [commands])]; only adjacent runs are merged so
+    # "next, pause, next" still does what the user asked for.
+    groups = []
+    for cmd in cmds:
+        last = groups[-1] if groups else None
+
+        if cmd.name in SKIP_STEPS:
+            if last and last[0] == "skip":
+                last[1]["offset"] += SKIP_STEPS[cmd.name]
+                last[2].append(cmd)
+            else:
+                groups.append(("skip", {"offset": SKIP_STEPS[cmd.name]}, [cmd]))
+            continue
+
+        if cmd.name in VOLUME_STEPS:
+            if last and last[0] == "volume":
+                last[1]["steps"] += VOLUME_STEPS[cmd.name]
+                last[2].append(cmd)
+            else:
+                groups.append(("volume", {"steps": VOLUME_STEPS[cmd.name]}, [cmd]))
+            continue
+
+        if last and last[0] == cmd.name and (cmd.name in LAST_WINS or last[1] == cmd.args):
+            groups[-1] = (cmd.name, cmd.args, last[2] + [cmd])
+            continue
+
+        groups.append((cmd.name, cmd.args, [cmd]))
+    return groups
+
+
+class CommandBus:
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._ids = itertools.count(1)
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._tickets = OrderedDict()
+        self.dropped = 0
+
+    # ---------- producer side ----------
+    def publish(self, command, source="api", created=None, **args):
+        if command not in COMMANDS:
+            raise ValueError(f"unknown player command: {command}")
+        cmd = Command(
+            next(self._ids), command, args, source,
+            created if created is not None else time.perf_counter()
+        )
+        self._remember(cmd)
+        try:
+            self._queue.put_nowait(cmd)
+        except queue.Full:
+            # player is hopelessly behind; never block a camera/mic thread
+            self.dropped += 1
+            cmd.state = DROPPED
+            cmd.done.set()
+        return cmd
+
+    def ticket(self, ticket_id):
+        with self._lock:
+            return self._tickets.get(ticket_id)
+
+    def _remember(self, cmd):
+        with self._lock:
+            self._tickets[cmd.id] = cmd
+            while len(self._tickets) > TICKET_HISTORY:
+                self._tickets.popitem(last=False)
+
+    # ---------- consumer side ----------
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        # everything already queued, without blocking
+        cmds = []
+        while True:
+            try:
+                cmds.append(self._queue.get_nowait())
+            except queue.Empty:
+                return cmds
+
+    def subscribe(self, fn):
+        # fn(cmd) is called on the consumer thread after each command ran
+        self._listeners.append(fn)
+
+    def complete(self, cmd, result=None, error=None, state=None, notify=True):
+        cmd.result = result
+        cmd.error = error
+        cmd.state = state or (FAILED if error else DONE)
+        latency_ms = (time.perf_counter() - cmd.created) * 1000
+        with self._lock:
+            self._latency.setdefault(cmd.source, deque(maxlen=LATENCY_WINDOW)).append(latency_ms)
+        cmd.done.set()
+        if error is None and notify:
+            for fn in self._listeners:
+                try:
+                    fn(cmd)
+                except Exception as e:
+                    print("Command listener error:", e)
+
+    # ---------- metrics ----------
+    def stats(self):
+        out = {"pending": self._queue.qsize(), "dropped": self.dropped, "latency_ms": {}}
+        with self._lock:
+            samples = {src: sorted(v) for src, v in self._latency.items()}
+        for src, values in samples.items():
+            n = len(values)
+            out["latency_ms"][src] = {
+                "count": n,
+                "mean": round(sum(values) / n, 2),
+                "p50": round(values[n // 2], 2),
+                "p95": round(values[min(n - 1, int(n * 0.95))], 2),
+                "max": round(values[-1], 2),
+            }
+        return out
+
+
+# one bus per process, shared by app, gesture and voice
+bus = CommandBus()
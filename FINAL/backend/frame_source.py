@@ -0,0 +1,240 @@
+# backend/frame_source.py
+import os
+import time
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+
+# ---------------- CONFIG ----------------
+# GESTURE_SOURCE picks where frames come from:
+#   camera:0            webcam index 0 (default)
+#   file:clip.mp4       a video file
+#   dir:frames/         a directory of images, in name order
+#   synthetic           generated frames, no hardware at all
+DEFAULT_SOURCE = os.environ.get("GESTURE_SOURCE", "camera:0")
+# files / image dirs a client may name over HTTP must live under here
+MEDIA_ROOT = os.path.abspath(os.environ.get(
+    "GESTURE_MEDIA_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gesture_media")
+))
+CAMERA_WIDTH = int(os.environ.get("GESTURE_WIDTH", 640))
+CAMERA_HEIGHT = int(os.environ.get("GESTURE_HEIGHT", 480))
+CAMERA_FPS = int(os.environ.get("GESTURE_FPS", 30))
+CAMERA_FOURCC = os.environ.get("GESTURE_FOURCC", "MJPG")      # MJPG / YUYV / "" for driver default
+CAMERA_BUFFERSIZE = int(os.environ.get("GESTURE_BUFFERSIZE", 1))   # 1 = never queue stale frames
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FrameSource(ABC):
+    # Same read()/release() contract as cv2.VideoCapture, so the capture
+    # stage does not care what is behind it. realtime=True paces non-camera
+    # sources at their nominal fps; False replays as fast as possible.
+
+    name = "source"
+
+    def __init__(self, fps=CAMERA_FPS, realtime=False):
+        self.fps = fps
+        self.realtime = realtime
+        self._next = None
+
+    def _pace(self):
+        if not self.realtime or not self.fps:
+            return
+        now = time.perf_counter()
+        if self._next is None:
+            self._next = now
+        elif self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(self._next + 1.0 / self.fps, now)
+
+    @abstractmethod
+    def read(self):
+        # -> (ok, frame)
+        ...
+
+    def release(self):
+        pass
+
+    def describe(self):
+        return {"type": self.name, "fps": self.fps, "realtime": self.realtime}
+
+
+class CameraSource(FrameSource):
+    name = "camera"
+
+    def __init__(self, index=0, width=CAMERA_WIDTH, height=CAMERA_HEIGHT, fps=CAMERA_FPS,
+                 fourcc=CAMERA_FOURCC, buffersize=CAMERA_BUFFERSIZE):
+        super().__init__(fps, realtime=True)
+        self.index = index
+        self.cap = cv2.VideoCapture(index)
+        # codec first: many UVC drivers only offer high fps at a size in MJPG
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width and height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffersize:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffersize)
+
+    def read(self):
+        # the driver paces us; no extra sleeping
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+    def describe(self):
+        # what the driver actually granted, which is not always what we asked for
+        code = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        fourcc = "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)) if code else ""
+        return {
+            "type": self.name,
+            "index": self.index,
+            "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": fourcc,
+            "buffersize": int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+        }
+
+
+class VideoFileSource(FrameSource):
+    name = "file"
+
+    def __init__(self, path, loop=False, realtime=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS) or CAMERA_FPS, realtime)
+
+    def read(self):
+        self._pace()
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+    def describe(self):
+        out = super().describe()
+        out["path"] = self.path
+        return out
+
+
+class ImageDirSource(FrameSource):
+    name = "dir"
+
+    def __init__(self, path, fps=CAMERA_FPS, loop=False, realtime=False):
+        super().__init__(fps, realtime)
+        self.path = path
+        self.loop = loop
+        self.files = sorted(
+            os.path.join(path, f) for f in os.listdir(path)
+            if f.lower().endswith(IMAGE_EXTS)
+        )
+        self._i = 0
+
+    def read(self):
+        if self._i >= len(self.files):
+            if not self.loop or not self.files:
+                return False, None
+            self._i = 0
+        self._pace()
+        frame = cv2.imread(self.files[self._i])
+        self._i += 1
+        return frame is not None, frame
+
+    def describe(self):
+        out = super().describe()
+        out.update(path=self.path, frames=len(self.files))
+        return out
+
+
+class SyntheticSource(FrameSource):
+    # noise background with a bright square sweeping across it; enough to
+    # wake the motion gate and load the pipeline end to end
+    name = "synthetic"
+
+    def __init__(self, width=CAMERA_WIDTH, height=CAMERA_HEIGHT, fps=CAMERA_FPS,
+                 frames=None, realtime=False):
+        super().__init__(fps, realtime)
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self._i = 0
+        rng = np.random.default_rng(0)
+        self._background = rng.integers(0, 60, (height, width, 3), dtype=np.uint8)
+
+    def read(self):
+        if self.frames is not None and self._i >= self.frames:
+            return False, None
+        self._pace()
+        frame = self._background.copy()
+        size = self.height // 4
+        x = (self._i * 8) % max(1, self.width - size)
+        frame[self.height // 3:self.height // 3 + size, x:x + size] = 220
+        self._i += 1
+        return True, frame
+
+    def describe(self):
+        out = super().describe()
+        out.update(width=self.width, height=self.height)
+        return out
+
+
+def _open(spec, options):
+    kind, _, arg = spec.partition(":")
+    if kind.isdigit():
+        return CameraSource(int(kind), **options)
+    if kind == "camera":
+        return CameraSource(int(arg or 0), **options)
+    if kind == "synthetic":
+        return SyntheticSource(**options)
+    if kind == "file":
+        return VideoFileSource(arg, **options)
+    if kind == "dir":
+        return ImageDirSource(arg, **options)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, **options)
+    if os.path.isfile(spec):
+        return VideoFileSource(spec, **options)
+    raise ValueError(f"unknown frame source: {spec}")
+
+
+def open_source(spec=None, live=False, **options):
+    # "camera:0" | "0" | "file:x.mp4" | "dir:path" | "synthetic" | a bare path
+    # live=True is the gesture capture thread: always paced, or a file /
+    # synthetic source would spin it flat out
+    source = _open(str(spec if spec is not None else DEFAULT_SOURCE), options)
+    if live:
+        source.realtime = True
+    return source
+
+
+def client_source(spec, media_root=MEDIA_ROOT):
+    # what an HTTP client may ask for: a camera index, or a file / image dir
+    # under media_root. -> normalised spec, ValueError otherwise
+    spec = str(spec).strip()
+    kind, _, arg = spec.partition(":")
+    if kind.isdigit() and not arg:
+        return f"camera:{int(kind)}"
+    if kind == "camera":
+        if arg and not arg.isdigit():
+            raise ValueError(f"camera index must be a number: {arg}")
+        return f"camera:{int(arg or 0)}"
+    if kind not in ("file", "dir"):
+        kind, arg = "", spec
+    root = os.path.realpath(media_root)
+    path = os.path.realpath(os.path.join(root, arg))
+    if not arg or os.path.commonpath([root, path]) != root:
+        raise ValueError("frame source must be a camera index or a path under GESTURE_MEDIA_ROOT")
+    if not os.path.exists(path):
+        raise ValueError(f"no such media: {arg}")
+    if not kind:
+        kind = "dir" if os.path.isdir(path) else "file"
+    return f"{kind}:{path}"
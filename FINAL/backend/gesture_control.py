@@ -1,193 +1,390 @@
 import cv2
 import time
-import requests
+import numpy as np
 import mediapipe as mp
 from mediapipe.tasks.python.vision import hand_landmarker
 from mediapipe.tasks.python import core
 import os
+import atexit
 import threading
+from backend.command_bus import bus
+from backend import command_bus as cb
+from backend.pipeline import LatestSlot, StageStats
+from backend.motion_gate import MotionGate
+from backend.gesture_recognizer import GestureRecognizer
+from backend.gesture_replay import LandmarkRecorder
+from backend.frame_source import open_source
 
 # ---------------- CONFIG ----------------
-API_BASE = "http://127.0.0.1:5000/api"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "hand_landmarker.task")
-COOLDOWN = 0.8  # seconds between gestures
+RECORDINGS_DIR = os.path.join(BASE_DIR, "recordings")
+PREVIEW_FPS = 15  # preview window refresh cap; inference is not throttled
+WINDOW_NAME = "Gesture Control"
 
-running = False
-last_action_time = 0
-last_gesture_ping = 0
+# recognizer gesture -> player command
+GESTURE_COMMANDS = {
+    "open_palm": cb.PLAY,
+    "fist": cb.PAUSE,
+    "swipe_right": cb.NEXT,
+    "swipe_left": cb.PREV,
+    "pinch_out": cb.VOLUME_UP,
+    "pinch_in": cb.VOLUME_DOWN,
+    "thumb_up": cb.LIKE,
+    "thumb_down": cb.DISLIKE,
+}
+
+# landmark pairs drawn on the preview (MediaPipe 21-point hand model)
+HAND_CONNECTIONS = [
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (17, 18), (18, 19), (19, 20),
+    (0, 17),
+]
+
+recognizer = GestureRecognizer()
+recorder = None   # LandmarkRecorder while a fixture is being recorded
+source_spec = None   # frame_source spec for the next start; None = GESTURE_SOURCE
+source_info = {}     # settings the active source actually runs with
 gesture_thread = None  # Thread-safe for EXE
+headless = os.environ.get("GESTURE_HEADLESS", "0") == "1"   # no cv2 GUI at all
+preview_fps = PREVIEW_FPS
+last_landmarks = None   # [(x, y), ...] from the latest result, for the overlay
 
-# ---------------------------------------
+# skip landmark inference while the scene is static (GESTURE_MOTION_GATE=0 disables)
+motion_gate = MotionGate() if os.environ.get("GESTURE_MOTION_GATE", "1") == "1" else None
 
-# ------------ CALLBACK -----------
-def gesture_callback(result, output_image, timestamp_ms):
-    global last_action_time
-    global last_gesture_ping
-    if not running:
-        return
 
-    if time.time() - last_gesture_ping > 2: 
-        try:
-            requests.post(f"{API_BASE}/gesture_active")
-        except:
-            pass
-        last_gesture_ping = time.time()
+class GestureSession:
+    # One start..stop run: its own stop flag and capture -> inference ->
+    # (preview) single-slot drop-oldest hand-offs, so threads of a session
+    # that is still winding down never see the next session's frames or
+    # keep running because a new start flipped a shared flag back on.
 
-    if time.time() - last_action_time < COOLDOWN:
-        return
+    def __init__(self):
+        self.stop = threading.Event()
+        self.frame_slot = LatestSlot()
+        self.preview_slot = LatestSlot()
+        self.thread = None
 
-    if not result.hand_landmarks:
-        return
+    @property
+    def running(self):
+        return not self.stop.is_set()
 
-    hand = result.hand_landmarks[0]
+    def end(self):
+        self.stop.set()
+        self.frame_slot.close()
+        self.preview_slot.close()
 
-    thumb_tip = hand[4]
-    index_tip = hand[8]
-    middle_tip = hand[12]
-    ring_tip = hand[16]
-    pinky_tip = hand[20]
-    wrist = hand[0]
 
-    # Open palm -> Play
-    if all([thumb_tip.y < index_tip.y,
-            index_tip.y < middle_tip.y,
-            middle_tip.y < ring_tip.y,
-            ring_tip.y < pinky_tip.y]):
-        try:
-            requests.post(f"{API_BASE}/play")
-        except:
-            pass
-        print("Play")
-        last_action_time = time.time()
-        return
+session = None   # the current GestureSession, if any
+_session_lock = threading.Lock()
+_listeners = []  # fn(running) when a session starts or ends
+stage_stats = {
+    "capture": StageStats(),     # source.read()
+    "inference": StageStats(),   # BGR->RGB + detect_async submit
+    "result": StageStats(),      # capture -> landmarker callback
+    "preview": StageStats(),     # imshow + waitKey
+    "recognize": StageStats(),   # GestureRecognizer.update
+}
+_last_timestamp_ms = 0
 
-    # Fist -> Pause
-    if all([thumb_tip.y > index_tip.y,
-            index_tip.y > middle_tip.y,
-            middle_tip.y > ring_tip.y,
-            ring_tip.y > pinky_tip.y]):
-        try:
-            requests.post(f"{API_BASE}/pause")
-        except:
-            pass
-        print("Pause")
-        last_action_time = time.time()
-        return
+# ---------------------------------------
 
-    # Swipe right -> Next
-    if index_tip.x - wrist.x > 0.25:
-        try:
-            requests.post(f"{API_BASE}/next")
-        except:
-            pass
-        print("Next")
-        last_action_time = time.time()
-        return
+def send_command(command, seen):
+    # publish straight to the player, no HTTP loopback
+    bus.publish(command, source="gesture", created=seen)
 
-    # Swipe left -> Previous
-    if index_tip.x - wrist.x < -0.25:
-        try:
-            requests.post(f"{API_BASE}/prev")
-        except:
-            pass
-        print("Prev")
-        last_action_time = time.time()
+# ------------ CALLBACK -----------
+def gesture_callback(result, output_image, timestamp_ms):
+    global last_landmarks
+    if session is None or not session.running:
         return
 
-    # Pinch out -> Volume up
-    pinch_dist = abs(thumb_tip.x - index_tip.x)
-    if pinch_dist > 0.18:
-        try:
-            requests.post(f"{API_BASE}/volume_up")
-        except:
-            pass
-        print("Volume Up")
-        last_action_time = time.time()
-        return
+    if not headless:
+        last_landmarks = (
+            [(lm.x, lm.y) for lm in result.hand_landmarks[0]]
+            if result.hand_landmarks else None
+        )
 
-    if pinch_dist < 0.04:
-        try:
-            requests.post(f"{API_BASE}/volume_down")
-        except:
-            pass
-        print("Volume Down")
-        last_action_time = time.time()
-        return
+    # timestamps are perf_counter ms of the capture, so this is glass-to-result
+    seen = timestamp_ms / 1000.0
+    stage_stats["result"].record(0, time.perf_counter() - seen)
+    if motion_gate and result.hand_landmarks:
+        motion_gate.hand_seen(seen)
 
-    # Thumb up -> Like
-    if thumb_tip.y < index_tip.y - 0.05:
-        try:
-            requests.post(f"{API_BASE}/like")
-        except:
-            pass
-        print("Like")
-        last_action_time = time.time()
-        return
+    t0 = time.perf_counter()
+    points = None
+    if result.hand_landmarks:
+        points = np.array([(lm.x, lm.y, lm.z) for lm in result.hand_landmarks[0]], np.float32)
+    gesture = recognizer.update(points, seen)
+    stage_stats["recognize"].record(time.perf_counter() - t0)
+    if recorder is not None:
+        recorder.add(points, seen, gesture)
 
-    # Thumb down -> Dislike
-    if thumb_tip.y > index_tip.y + 0.1:
-        try:
-            requests.post(f"{API_BASE}/dislike")
-        except:
-            pass
-        print("Dislike")
-        last_action_time = time.time()
-        return
+    if gesture:
+        send_command(GESTURE_COMMANDS[gesture], seen)
+        print("Gesture:", gesture)
 
 # --------- Initialize HandLandmarker Task -------
+# One landmarker per process: built once (optionally pre-warmed at server
+# start), kept across stop/start and closed only on shutdown.
 
 landmarker = None
+_landmarker_lock = threading.Lock()
+_start_requested = None   # (perf_counter, "cold" | "warm") of the pending start
+landmarker_timing = {
+    "create_ms": None,       # reading hand_landmarker.task + building the graph
+    "cold_start_ms": None,   # start_gesture() -> first frame submitted, no landmarker yet
+    "warm_start_ms": None,   # same, reusing the existing landmarker
+    "creates": 0,
+    "starts": 0,
+}
 
-# ---------------- CAMERA LOOP ----------------
-def _gesture_loop():
-    global running, landmarker
-    if landmarker is None:
-        base_options = core.base_options.BaseOptions(model_asset_path=MODEL_PATH)
-        options = hand_landmarker.HandLandmarkerOptions(
-            base_options=base_options,
-            running_mode=hand_landmarker._RunningMode.LIVE_STREAM,
-            result_callback=gesture_callback,
-            num_hands=1
-        )
-        landmarker = hand_landmarker.HandLandmarker.create_from_options(options)
+def get_landmarker():
+    global landmarker
+    with _landmarker_lock:
+        if landmarker is None:
+            t0 = time.perf_counter()
+            base_options = core.base_options.BaseOptions(model_asset_path=MODEL_PATH)
+            options = hand_landmarker.HandLandmarkerOptions(
+                base_options=base_options,
+                running_mode=hand_landmarker._RunningMode.LIVE_STREAM,
+                result_callback=gesture_callback,
+                num_hands=1
+            )
+            landmarker = hand_landmarker.HandLandmarker.create_from_options(options)
+            landmarker_timing["create_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            landmarker_timing["creates"] += 1
+        return landmarker
+
+def prewarm_landmarker():
+    # build the TFLite graph in the background so the first /api/gesture/start is warm
+    def _warm():
+        try:
+            get_landmarker()
+            print("✋ HandLandmarker ready in", landmarker_timing["create_ms"], "ms")
+        except Exception as e:
+            print("HandLandmarker prewarm failed:", e)
+    threading.Thread(target=_warm, daemon=True).start()
+
+def release_landmarker():
+    global landmarker
+    with _landmarker_lock:
+        if landmarker is not None:
+            try:
+                landmarker.close()
+            except Exception:
+                pass
+            landmarker = None
+
+atexit.register(release_landmarker)
+
+def _record_start():
+    global _start_requested
+    if _start_requested is None:
+        return
+    started, kind = _start_requested
+    _start_requested = None
+    landmarker_timing[f"{kind}_start_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    landmarker_timing["starts"] += 1
 
-    cap = cv2.VideoCapture(0)
-    while running:
-        ret, frame = cap.read()
+# ---------------- PIPELINE STAGES ----------------
+def _next_timestamp_ms(captured):
+    # detect_async needs strictly increasing timestamps for the landmarker's
+    # whole life; perf_counter is monotonic and _last_timestamp_ms survives
+    # stop/start, so a reused landmarker never sees time go backwards
+    global _last_timestamp_ms
+    ts = max(int(captured * 1000), _last_timestamp_ms + 1)
+    _last_timestamp_ms = ts
+    return ts
+
+def _capture_stage(sess, source):
+    while sess.running:
+        t0 = time.perf_counter()
+        ret, frame = source.read()
         if not ret:
             break
+        captured = time.perf_counter()
+        stage_stats["capture"].record(captured - t0)
+
+        sess.frame_slot.put((frame, captured))
+        if not headless:
+            sess.preview_slot.put((frame, captured))
+    sess.stop.set()
 
+def _inference_stage(sess, detector):
+    while sess.running:
+        item = sess.frame_slot.get(timeout=0.5)
+        if item is None:
+            continue
+        frame, captured = item
+        if motion_gate and not motion_gate.should_infer(frame, captured):
+            continue
+        t0 = time.perf_counter()
         frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
-        timestamp_ms = int(time.time() * 1000)
-        landmarker.detect_async(mp_image, timestamp_ms)
-
-        cv2.namedWindow("Gesture Control", cv2.WINDOW_NORMAL)
-        cv2.resizeWindow("Gesture Control", 640, 480)
-        cv2.imshow("Gesture Control", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            stop_gesture()
+        detector.detect_async(mp_image, _next_timestamp_ms(captured))
+        t1 = time.perf_counter()
+        _record_start()
+        stage_stats["inference"].record(t1 - t0, t1 - captured)
+
+def _draw_landmarks(frame, points):
+    h, w = frame.shape[:2]
+    pts = [(int(x * w), int(y * h)) for x, y in points]
+    for a, b in HAND_CONNECTIONS:
+        cv2.line(frame, pts[a], pts[b], (0, 255, 0), 2)
+    for p in pts:
+        cv2.circle(frame, p, 4, (0, 0, 255), -1)
+
+def _preview_stage(sess):
+    # window is created once; frames arriving faster than preview_fps are
+    # simply overwritten in preview_slot and never drawn
+    cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+    cv2.resizeWindow(WINDOW_NAME, 640, 480)
+    interval = 1.0 / max(1, preview_fps)
+    next_draw = time.perf_counter()
+
+    while sess.running:
+        item = sess.preview_slot.get(timeout=0.5)
+        if item is None:
+            continue
+        frame, captured = item
+        t0 = time.perf_counter()
+        points = last_landmarks
+        if points:
+            frame = frame.copy()   # inference may still hold the original
+            _draw_landmarks(frame, points)
+        cv2.imshow(WINDOW_NAME, frame)
+
+        # waitKey doubles as the frame-rate cap and keeps the window responsive
+        next_draw = max(next_draw + interval, t0)
+        wait_ms = max(1, int((next_draw - time.perf_counter()) * 1000))
+        key = cv2.waitKey(wait_ms) & 0xFF
+        t1 = time.perf_counter()
+        stage_stats["preview"].record(t1 - t0, t1 - captured)
+        if key == ord('q'):
+            sess.end()
             break
 
-    cap.release()
-    cv2.destroyAllWindows()
-    running = False
+    cv2.destroyWindow(WINDOW_NAME)
 
-def start_gesture():
-    global running, gesture_thread
-    if running:
-        return
-    running = True
-    gesture_thread = threading.Thread(target=_gesture_loop, daemon=True)
-    gesture_thread.start()
+# ---------------- CAMERA LOOP ----------------
+def _gesture_loop(sess):
+    detector = get_landmarker()
 
-def stop_gesture():
-    global running, landmarker
-    if running:
-        running = False
-        landmarker = None
+    for stats in stage_stats.values():
+        stats.reset()
+    if motion_gate:
+        motion_gate.reset()
+
+    stages = [threading.Thread(target=_inference_stage, args=(sess, detector), daemon=True)]
+    if not headless:
+        stages.append(threading.Thread(target=_preview_stage, args=(sess,), daemon=True))
+    for t in stages:
+        t.start()
+
+    # capture runs on this thread; inference/preview only ever see the newest frame
+    try:
+        source = open_source(source_spec, live=True)
+    except Exception as e:
+        print("Gesture frame source error:", e)
+        source = None
+    if source is not None:
+        source_info.clear()
+        source_info.update(source.describe())
+        _capture_stage(sess, source)
+
+    sess.end()
+    for t in stages:
+        t.join(timeout=2)
+    if source is not None:
+        source.release()
+    _notify()     # ended by stop, 'q' or the source running out
+
+def subscribe(fn):
+    # fn(running) runs on the thread that started / ended the session
+    _listeners.append(fn)
+
+def gesture_running():
+    sess = session
+    return sess is not None and sess.running
+
+def _notify():
+    running = gesture_running()
+    for fn in list(_listeners):
         try:
-            requests.post(f"{API_BASE}/gesture_inactive")
-        except:
-            pass
+            fn(running)
+        except Exception as e:
+            print("Gesture listener error:", e)
+
+def gesture_stats():
+    out = {name: stats.snapshot() for name, stats in stage_stats.items()}
+    sess = session
+    out["dropped_frames"] = {
+        "inference": sess.frame_slot.dropped if sess else 0,
+        "preview": sess.preview_slot.dropped if sess else 0,
+    }
+    if motion_gate:
+        # detect_async returns before inference runs, so one landmark pass
+        # costs roughly (capture->result) - (capture->submit)
+        infer_ms = max(0.0, out["result"]["latency_ms"] - out["inference"]["latency_ms"])
+        out["motion_gate"] = motion_gate.report(infer_ms)
+    out["landmarker"] = dict(landmarker_timing)
+    out["source"] = dict(source_info)
+    out["running"] = sess is not None and sess.running
+    out["headless"] = headless
+    return out
+
+def start_recording():
+    # capture the landmark stream for backend/gesture_replay.py
+    global recorder
+    recorder = LandmarkRecorder()
+
+def stop_recording(path=None):
+    global recorder
+    rec, recorder = recorder, None
+    if rec is None or not rec.timestamps:
+        return None
+    if path is None:
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
+        path = os.path.join(RECORDINGS_DIR, time.strftime("gesture_%Y%m%d_%H%M%S.npz"))
+    return rec.save(path)
+
+def start_gesture(headless_mode=None, fps=None, source=None):
+    # headless_mode=True skips every cv2 window call (kiosks, servers);
+    # None keeps the current / GESTURE_HEADLESS setting.
+    # source: frame_source spec such as "camera:1", "file:clip.mp4", "synthetic"
+    global session, gesture_thread, headless, preview_fps, last_landmarks, _start_requested
+    global source_spec
+    with _session_lock:
+        old = session
+        if old is not None and old.running:
+            return
+        if old is not None and old.thread is not None:
+            # a stop that is still winding down: finish it before reusing
+            # the landmarker, or its capture/inference threads live on
+            old.end()
+            old.thread.join(timeout=5)
+        if source is not None:
+            source_spec = source
+        _start_requested = (time.perf_counter(), "warm" if landmarker is not None else "cold")
+        if headless_mode is not None:
+            headless = bool(headless_mode)
+        if fps:
+            preview_fps = int(fps)
+        last_landmarks = None
+        recognizer.reset()
+        session = GestureSession()
+        gesture_thread = session.thread = threading.Thread(target=_gesture_loop, args=(session,), daemon=True)
+        session.thread.start()
+    _notify()
+
+def stop_gesture():
+    # the landmarker stays loaded for the next start; see release_landmarker()
+    sess = session
+    if sess is not None:
+        sess.end()
+        _notify()
@@ -0,0 +1,195 @@
+# backend/gesture_recognizer.py
+import numpy as np
+
+# ---------------- CONFIG ----------------
+HISTORY = 16              # frames of 21x3 landmarks kept in the ring buffer
+
+WRIST = 0
+TIPS = np.array([4, 8, 12, 16, 20])     # thumb, index, middle, ring, pinky
+PIPS = np.array([2, 6, 10, 14, 18])
+PALM = np.array([0, 5, 9, 13, 17])
+
+EXTENDED_RATIO = 1.15     # tip further from wrist than its PIP joint by this much
+POSE_FRAMES = 4           # static pose must hold this many frames to fire
+RELEASE_FRAMES = 3        # ... and be gone this many frames to re-arm
+STILL_SPEED = 0.6         # palm speed (frame widths / s) above which poses are ignored
+
+SWIPE_WINDOW = 0.35       # s of history a swipe is measured over
+SWIPE_DISTANCE = 0.22     # palm travel (frame widths) inside the window
+SWIPE_RELEASE = 0.08      # travel below which a swipe counts as over (hysteresis)
+
+PINCH_WINDOW = 0.4        # s of history a pinch is measured over
+PINCH_CHANGE = 0.35       # change of thumb-index gap, in palm sizes
+PINCH_RELEASE = 0.1       # gap change below which a pinch counts as over
+
+REFRACTORY = {            # per-gesture minimum seconds between two firings
+    "open_palm": 1.0,
+    "fist": 1.0,
+    "swipe_right": 0.6,
+    "swipe_left": 0.6,
+    "pinch_out": 0.5,
+    "pinch_in": 0.5,
+    "thumb_up": 1.5,
+    "thumb_down": 1.5,
+}
+
+GESTURES = tuple(REFRACTORY)
+
+# firing one side also blocks its opposite for the refractory period,
+# so the hand's return stroke after a swipe is not read as a swipe back
+OPPOSITE = {
+    "swipe_right": "swipe_left", "swipe_left": "swipe_right",
+    "pinch_out": "pinch_in", "pinch_in": "pinch_out",
+}
+
+# finger extension pattern (thumb..pinky) -> static pose
+POSES = {
+    (True, True, True, True, True): "open_palm",
+    (False, False, False, False, False): "fist",
+}
+
+
+class GestureRecognizer:
+    # Temporal recognizer over the last HISTORY frames of hand landmarks.
+    # Static poses need POSE_FRAMES consecutive frames, swipes and pinches
+    # are measured from motion inside a time window, and every gesture has
+    # its own arm/disarm hysteresis plus a refractory period, so holding a
+    # pose or finishing a swipe fires exactly once.
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self._landmarks = np.zeros((history, 21, 3), np.float32)
+        self._center = np.zeros((history, 2), np.float32)
+        self._pinch = np.zeros(history, np.float32)
+        self._t = np.full(history, -np.inf)
+        self.reset()
+
+    def reset(self):
+        self._clear_track()
+        self._absent = {g: RELEASE_FRAMES for g in GESTURES}
+        self._armed = {g: True for g in GESTURES}
+        self._last_fired = {g: -np.inf for g in GESTURES}
+
+    def _clear_track(self):
+        # motion history and pose counters only; arm state and refractory
+        # timers are kept so a short tracking loss cannot re-fire a gesture
+        self._t[:] = -np.inf
+        self._i = 0
+        self._count = 0
+        self._pose = None
+        self._pose_frames = 0
+
+    # ---------- features ----------
+    @staticmethod
+    def extension(points):
+        # bool[5]: is each finger extended (tip further from wrist than PIP)
+        wrist = points[WRIST, :2]
+        tip_d = np.linalg.norm(points[TIPS, :2] - wrist, axis=1)
+        pip_d = np.linalg.norm(points[PIPS, :2] - wrist, axis=1)
+        return tip_d > pip_d * EXTENDED_RATIO
+
+    @staticmethod
+    def palm_size(points):
+        return float(np.linalg.norm(points[9, :2] - points[WRIST, :2])) or 1e-6
+
+    def _window(self, now, seconds):
+        # index of the oldest sample still inside [now - seconds, now]
+        inside = self._t >= now - seconds
+        if not inside.any():
+            return None
+        return int(np.argmin(np.where(inside, self._t, np.inf)))
+
+    def velocity(self, now, seconds=SWIPE_WINDOW):
+        j = self._window(now, seconds)
+        cur = (self._i - 1) % self.history
+        if j is None or j == cur:
+            return np.zeros(2, np.float32), 0.0
+        dt = self._t[cur] - self._t[j]
+        delta = self._center[cur] - self._center[j]
+        return delta, float(np.linalg.norm(delta) / dt) if dt > 0 else 0.0
+
+    # ---------- main entry ----------
+    def update(self, points, now):
+        # points: (21, 3) array of normalised landmarks, or None when no hand.
+        # Returns the gesture name that fired on this frame, or None.
+        if points is None:
+            self._clear_track()
+            # a missing hand counts as "gesture absent" for re-arming, so a
+            # single dropout frame stays below RELEASE_FRAMES
+            for name in GESTURES:
+                self._absent[name] += 1
+                if self._absent[name] >= RELEASE_FRAMES:
+                    self._armed[name] = True
+            return None
+
+        points = np.asarray(points, np.float32)
+        i = self._i
+        self._landmarks[i] = points
+        self._center[i] = points[PALM, :2].mean(axis=0)
+        self._pinch[i] = np.linalg.norm(points[4, :2] - points[8, :2]) / self.palm_size(points)
+        self._t[i] = now
+        self._i = (i + 1) % self.history
+        self._count += 1
+
+        seen = set()
+        fired = None
+
+        # ----- swipes: mostly-horizontal palm travel inside the window -----
+        delta, speed = self.velocity(now)
+        dx, dy = float(delta[0]), float(delta[1])
+        if abs(dx) > 2 * abs(dy):
+            name = "swipe_right" if dx > 0 else "swipe_left"
+            if abs(dx) >= SWIPE_RELEASE:
+                seen.add(name)
+            if abs(dx) >= SWIPE_DISTANCE:
+                fired = self._fire(name, now)
+
+        # ----- pinches: change of thumb-index gap inside the window -----
+        j = self._window(now, PINCH_WINDOW)
+        change = float(self._pinch[i] - self._pinch[j]) if j is not None else 0.0
+        name = "pinch_out" if change > 0 else "pinch_in"
+        if abs(change) >= PINCH_RELEASE:
+            seen.add(name)
+        if fired is None and abs(change) >= PINCH_CHANGE:
+            fired = self._fire(name, now)
+
+        # ----- static poses: only while the hand is roughly still -----
+        pose = None
+        if speed < STILL_SPEED:
+            ext = self.extension(points)
+            pose = POSES.get(tuple(bool(e) for e in ext))
+            if pose is None and ext[0] and not ext[1:].any():
+                # thumb alone: up or down relative to the wrist
+                lift = (points[WRIST, 1] - points[4, 1]) / self.palm_size(points)
+                if lift > 0.5:
+                    pose = "thumb_up"
+                elif lift < -0.5:
+                    pose = "thumb_down"
+
+        if pose == self._pose:
+            self._pose_frames += 1
+        else:
+            self._pose, self._pose_frames = pose, 1
+        if pose is not None:
+            seen.add(pose)
+            if fired is None and self._pose_frames >= POSE_FRAMES:
+                fired = self._fire(pose, now)
+
+        # ----- hysteresis: re-arm gestures that have been absent long enough -----
+        for name in GESTURES:
+            if name in seen:
+                self._absent[name] = 0
+            else:
+                self._absent[name] += 1
+                if self._absent[name] >= RELEASE_FRAMES:
+                    self._armed[name] = True
+        return fired
+
+    def _fire(self, name, now):
+        if not self._armed[name] or now - self._last_fired[name] < REFRACTORY[name]:
+            return None
+        self._armed[name] = False
+        self._last_fired[name] = now
+        if name in OPPOSITE:
+            self._last_fired[OPPOSITE[name]] = now
+        return name
@@ -0,0 +1,384 @@
+# backend/gesture_replay.py
+#
+# Offline record / replay / benchmark for the gesture engine.
+#
+#   python -m backend.gesture_replay session1.npz session2.npz
+#   python -m backend.gesture_replay clip.mp4 --labels clip_labels.json
+#   python -m backend.gesture_replay --synthetic          # no fixtures needed;
+#                                                         # checks the harness, not accuracy
+#
+# A session .npz holds
+#   timestamps  (T,)        float64 seconds
+#   landmarks   (T, 21, 3)  float32, NaN rows where no hand was detected
+#   label_times (K,)        float64 seconds a gesture was performed
+#   label_names (K,)        str gesture names (see gesture_recognizer.GESTURES)
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.gesture_recognizer import GestureRecognizer, GESTURES
+
+TOLERANCE = 0.5   # s between a labeled gesture and the firing that counts as a hit
+
+
+# ---------------- RECORDING ----------------
+class LandmarkRecorder:
+    # Collects the landmark stream seen by gesture_callback. Gestures the
+    # live recognizer fired are saved as labels so a fixture only needs
+    # correcting, not labeling from scratch.
+
+    def __init__(self):
+        self.timestamps = []
+        self.landmarks = []
+        self.label_times = []
+        self.label_names = []
+
+    def add(self, points, t, fired=None):
+        self.timestamps.append(t)
+        self.landmarks.append(np.full((21, 3), np.nan, np.float32) if points is None else points)
+        if fired:
+            self.label_times.append(t)
+            self.label_names.append(fired)
+
+    def save(self, path):
+        t0 = self.timestamps[0] if self.timestamps else 0.0
+        np.savez_compressed(
+            path,
+            timestamps=np.asarray(self.timestamps, np.float64) - t0,
+            landmarks=np.asarray(self.landmarks, np.float32).reshape(-1, 21, 3),
+            label_times=np.asarray(self.label_times, np.float64) - t0,
+            label_names=np.asarray(self.label_names, dtype=str),
+        )
+        return path
+
+
+def load_session(path, labels_path=None):
+    if path.endswith(".npz"):
+        data = np.load(path)
+        session = {k: data[k] for k in data.files}
+    else:
+        session = landmarks_from_video(path)
+    if labels_path:
+        with open(labels_path) as f:
+            labels = json.load(f)   # [{"t": 1.2, "gesture": "swipe_right"}, ...]
+        session["label_times"] = np.array([l["t"] for l in labels], np.float64)
+        session["label_names"] = np.array([l["gesture"] for l in labels], dtype=str)
+    return session
+
+
+def landmarks_from_video(path):
+    # raw clip -> landmark stream, using the landmarker in VIDEO mode
+    import cv2
+    import mediapipe as mp
+    from mediapipe.tasks.python.vision import hand_landmarker
+    from mediapipe.tasks.python import core
+    from backend.gesture_control import MODEL_PATH
+
+    options = hand_landmarker.HandLandmarkerOptions(
+        base_options=core.base_options.BaseOptions(model_asset_path=MODEL_PATH),
+        running_mode=hand_landmarker._RunningMode.VIDEO,
+        num_hands=1
+    )
+    detector = hand_landmarker.HandLandmarker.create_from_options(options)
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    rec = LandmarkRecorder()
+    i = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        t = i / fps
+        result = detector.detect_for_video(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb), int(t * 1000))
+        points = None
+        if result.hand_landmarks:
+            points = np.array([(lm.x, lm.y, lm.z) for lm in result.hand_landmarks[0]], np.float32)
+        rec.add(points, t)
+        i += 1
+    cap.release()
+    detector.close()
+    return {
+        "timestamps": np.asarray(rec.timestamps, np.float64),
+        "landmarks": np.asarray(rec.landmarks, np.float32).reshape(-1, 21, 3),
+        "label_times": np.zeros(0, np.float64),
+        "label_names": np.zeros(0, dtype=str),
+    }
+
+
+# ---------------- SYNTHETIC FIXTURE ----------------
+# Generated stand-in for a recorded session. Amplitudes and speeds are
+# drawn around the recognizer's thresholds, not at them, and unlabeled
+# look-alikes sit between the gestures, so a misfire or a miss is
+# possible. It checks the harness end to end; its precision / recall is
+# NOT an accuracy figure, only recorded sessions give one.
+JITTER = 0.003        # whole-hand shake per frame, normalised units
+JOINT_JITTER = 0.0015 # extra per-landmark noise on top of it
+DROPOUT = 0.01        # share of frames where tracking loses the hand
+NEUTRAL = ((0, 1, 1, 0, 0), (1, 1, 0, 0, 0), (0, 1, 0, 0, 0))   # shapes that are no gesture
+
+
+def _synthetic_hand(cx, cy, extended=(1, 1, 1, 1, 1), pinch=None, thumb=0, aside=0, scale=1.0):
+    # extended: per finger 0 (curled) .. 1 (straight), a straight thumb splays out;
+    # thumb / aside: thumb pointing up (+) or down (-) / out to the side;
+    # scale: hand size in frame
+    p = np.zeros((21, 3), np.float32)
+    p[0] = (cx, cy + 0.15, 0)
+    for f, (tip, pip) in enumerate(zip((4, 8, 12, 16, 20), (2, 6, 10, 14, 18))):
+        x = cx - 0.08 + 0.04 * f
+        p[pip] = (x, cy, 0)
+        if f == 0:
+            p[tip] = (x - 0.07 * extended[0], cy + 0.1 - 0.15 * extended[0], 0)
+        else:
+            p[tip] = (x, cy + 0.1 - 0.2 * extended[f], 0)
+    for k, mcp in enumerate((5, 9, 13, 17)):
+        p[mcp] = (cx - 0.04 + 0.04 * k, cy + 0.05, 0)
+    for k, joint in enumerate((1, 3)):
+        p[joint] = (cx - 0.08, cy + 0.1 - 0.05 * k, 0)
+    if thumb or aside:
+        p[2] = (cx - 0.08 - 0.05 * aside, cy + 0.15 - 0.05 * thumb, 0)
+        p[4] = (cx - 0.08 - 0.15 * aside, cy + 0.15 - 0.15 * thumb, 0)
+    if pinch is not None:
+        p[4] = (p[8][0] - pinch, p[8][1], 0)
+    p[:, :2] = (cx, cy) + (p[:, :2] - (cx, cy)) * scale
+    return p
+
+
+def synthetic_session(fps=30.0, repeats=8, seed=0):
+    # every round: the 8 gestures plus 7 near misses, shuffled, with gaps
+    rng = np.random.default_rng(seed)
+    U = rng.uniform
+    rec = LandmarkRecorder()
+    t = 0.0
+    last = None     # previous clean frame, to move the hand there instead of teleporting
+
+    def frames_for(seconds):
+        return max(1, int(round(seconds * fps)))
+
+    def shape(pattern):
+        return tuple(U(0.8, 1.0) if e else U(0.0, 0.25) for e in pattern)
+
+    def emit(frames, label=None, at=0):
+        nonlocal t, last
+        if last is not None and frames[0] is not None:
+            # hand stayed in view: glide and reshape into the next segment
+            steps = np.linspace(0, 1, frames_for(U(0.2, 0.4)) + 1)[1:-1, None, None]
+            frames = [last + (frames[0] - last) * a for a in steps] + list(frames)
+            at += len(steps)
+        last = frames[-1]
+        for k, points in enumerate(frames):
+            if points is not None:
+                noise = rng.normal(0, JITTER, 3) + rng.normal(0, JOINT_JITTER, points.shape)
+                points = points + noise.astype(np.float32)
+                if rng.random() < DROPOUT:
+                    points = None
+            rec.add(points, t, label if k == at else None)
+            t += 1.0 / fps
+
+    def hold(ext, seconds, label=None, tremor=0.0, **kw):
+        cx, cy, size = U(0.35, 0.65), U(0.35, 0.65), U(0.7, 1.3)
+        n = frames_for(seconds)
+        # tremor shakes the whole hand, it does not reshape it
+        frames = [
+            _synthetic_hand(cx, cy, ext, scale=size, **kw) + rng.normal(0, tremor, 3).astype(np.float32)
+            for _ in range(n)
+        ]
+        emit(frames, label, n // 2)
+
+    def stroke(dx, dy, seconds, label=None, ext=None, back=0.0):
+        # palm travel with an ease-in-out profile; label at the fastest frame
+        ext = ext or shape(NEUTRAL[0] if rng.random() < 0.5 else (1, 1, 1, 1, 1))
+        size = U(0.7, 1.3)
+        x0, y0 = 0.5 - dx / 2, 0.5 - dy / 2
+        lead, n = int(rng.integers(0, 4)), frames_for(seconds)
+        u = np.linspace(0, 1, n)
+        u = u * u * (3 - 2 * u)
+        path = [(x0, y0)] * lead + [(x0 + dx * a, y0 + dy * a) for a in u]
+        if back:
+            # the hand drifting home after a swipe, slower than the swipe
+            m = frames_for(seconds * back)
+            v = np.linspace(0, 1, m)
+            path += [(x0 + dx * (1 - a), y0 + dy * (1 - a)) for a in v * v * (3 - 2 * v)]
+        emit([_synthetic_hand(x, y, ext, scale=size) for x, y in path], label, lead + n // 2)
+
+    def pinch(start, stop, seconds, label=None):
+        # thumb-index gap in palm sizes (a palm is 0.1 before scaling)
+        cx, cy, size = U(0.35, 0.65), U(0.35, 0.65), U(0.7, 1.3)
+        ext = shape((0, 1, 0, 0, 0))
+        lead, n = int(rng.integers(3, 7)), frames_for(seconds)
+        gaps = [start] * lead + list(np.linspace(start, stop, n))
+        emit([_synthetic_hand(cx, cy, ext, pinch=0.1 * g, scale=size) for g in gaps], label, lead + n // 2)
+
+    def side():
+        return 1 if rng.random() < 0.5 else -1
+
+    def partial_palm():
+        ext = list(shape((1, 1, 1, 1, 1)))
+        ext[int(rng.integers(1, 5))] = U(0.3, 0.5)
+        hold(ext, U(0.5, 1.2))
+
+    def small_pinch():
+        a, b = U(0.1, 0.4), U(0.1, 0.28)
+        pinch(*((a, a + b) if rng.random() < 0.5 else (a + b, a)), U(0.2, 0.5))
+
+    positives = [
+        lambda: hold(shape((1, 1, 1, 1, 1)), U(0.3, 1.0), "open_palm"),
+        lambda: hold(shape((0, 0, 0, 0, 0)), U(0.3, 1.0), "fist"),
+        lambda: hold(shape((1, 0, 0, 0, 0)), U(0.3, 1.0), "thumb_up", thumb=U(0.7, 1.0)),
+        lambda: hold(shape((1, 0, 0, 0, 0)), U(0.3, 1.0), "thumb_down", thumb=-U(0.7, 1.0)),
+        lambda: stroke(U(0.18, 0.45), U(-0.05, 0.05), U(0.15, 0.5), "swipe_right",
+                       back=U(1.5, 3.0) if rng.random() < 0.4 else 0.0),
+        lambda: stroke(-U(0.18, 0.45), U(-0.05, 0.05), U(0.15, 0.5), "swipe_left",
+                       back=U(1.5, 3.0) if rng.random() < 0.4 else 0.0),
+        lambda: pinch(U(0.1, 0.3), U(0.9, 1.4), U(0.2, 0.5), "pinch_out"),
+        lambda: pinch(U(0.9, 1.4), U(0.1, 0.3), U(0.2, 0.5), "pinch_in"),
+    ]
+    negatives = [
+        lambda: hold(shape(NEUTRAL[rng.integers(len(NEUTRAL))]), U(1.0, 2.0), tremor=U(0.005, 0.012)),
+        lambda: stroke(side() * U(0.2, 0.4), U(-0.03, 0.03), U(1.2, 2.5)),      # slow drift
+        lambda: stroke(side() * U(0.06, 0.15), U(-0.03, 0.03), U(0.2, 0.4)),    # short swipe
+        lambda: stroke(U(-0.08, 0.08), side() * U(0.2, 0.35), U(0.2, 0.4)),     # hand raised / lowered
+        partial_palm,
+        lambda: hold(shape((1, 0, 0, 0, 0)), U(0.5, 1.2), thumb=U(-0.25, 0.25), aside=U(0.8, 1.0)),  # thumb sideways
+        small_pinch,
+    ]
+
+    for _ in range(repeats):
+        segments = positives + negatives
+        for k in rng.permutation(len(segments)):
+            segments[k]()
+            if rng.random() < 0.7:
+                emit([None] * frames_for(U(0.2, 0.8)))
+            else:
+                hold(shape(NEUTRAL[rng.integers(len(NEUTRAL))]), U(0.3, 1.0))
+    return {
+        "timestamps": np.asarray(rec.timestamps, np.float64),
+        "landmarks": np.asarray(rec.landmarks, np.float32).reshape(-1, 21, 3),
+        "label_times": np.asarray(rec.label_times, np.float64),
+        "label_names": np.asarray(rec.label_names, dtype=str),
+    }
+
+
+# ---------------- REPLAY + METRICS ----------------
+def replay(session, recognizer=None):
+    # Feed a session through the recognizer as fast as it will go.
+    # Returns (predictions [(t, gesture)], per-frame latencies in seconds).
+    recognizer = recognizer or GestureRecognizer()
+    timestamps = session["timestamps"]
+    landmarks = session["landmarks"]
+    has_hand = ~np.isnan(landmarks[:, 0, 0])
+    latencies = np.empty(len(timestamps))
+    predictions = []
+    clock = time.perf_counter
+    for k in range(len(timestamps)):
+        points = landmarks[k] if has_hand[k] else None
+        t0 = clock()
+        fired = recognizer.update(points, timestamps[k])
+        latencies[k] = clock() - t0
+        if fired:
+            predictions.append((float(timestamps[k]), fired))
+    return predictions, latencies
+
+
+def score(predictions, label_times, label_names, tolerance=TOLERANCE):
+    # greedy in-time matching of firings to labels of the same gesture
+    per = {g: {"tp": 0, "fp": 0, "fn": 0} for g in GESTURES}
+    used = np.zeros(len(label_times), bool)
+    for t, name in predictions:
+        candidates = [
+            k for k in range(len(label_times))
+            if not used[k] and label_names[k] == name and abs(label_times[k] - t) <= tolerance
+        ]
+        if candidates:
+            k = min(candidates, key=lambda k: abs(label_times[k] - t))
+            used[k] = True
+            per[name]["tp"] += 1
+        else:
+            per[name]["fp"] += 1
+    for k in np.flatnonzero(~used):
+        per[str(label_names[k])]["fn"] += 1
+
+    for counts in per.values():
+        tp, fp, fn = counts["tp"], counts["fp"], counts["fn"]
+        counts["precision"] = round(tp / (tp + fp), 3) if tp + fp else None
+        counts["recall"] = round(tp / (tp + fn), 3) if tp + fn else None
+    total = {k: sum(c[k] for c in per.values()) for k in ("tp", "fp", "fn")}
+    total["precision"] = round(total["tp"] / (total["tp"] + total["fp"]), 3) if total["tp"] + total["fp"] else None
+    total["recall"] = round(total["tp"] / (total["tp"] + total["fn"]), 3) if total["tp"] + total["fn"] else None
+    return per, total
+
+
+def benchmark(sessions, tolerance=TOLERANCE):
+    all_latency = []
+    predictions_all, label_t, label_n = [], [], []
+    offset = 0.0
+    wall = 0.0
+    frames = 0
+    for session in sessions:
+        t0 = time.perf_counter()
+        predictions, latencies = replay(session)
+        wall += time.perf_counter() - t0
+        frames += len(latencies)
+        all_latency.append(latencies)
+        # sessions are scored on one timeline, shifted so they do not overlap
+        predictions_all += [(t + offset, g) for t, g in predictions]
+        label_t += list(session["label_times"] + offset)
+        label_n += [str(n) for n in session["label_names"]]
+        if len(session["timestamps"]):
+            offset += float(session["timestamps"][-1]) + 10 * tolerance
+
+    latency_us = np.concatenate(all_latency) * 1e6 if all_latency else np.zeros(1)
+    per, total = score(predictions_all, np.asarray(label_t), np.asarray(label_n), tolerance)
+    return {
+        "frames": frames,
+        "throughput_fps": round(frames / wall, 1) if wall else None,
+        "realtime_factor": round(frames / 30.0 / wall, 1) if wall else None,
+        "latency_us": {
+            "p50": round(float(np.percentile(latency_us, 50)), 1),
+            "p95": round(float(np.percentile(latency_us, 95)), 1),
+            "p99": round(float(np.percentile(latency_us, 99)), 1),
+            "max": round(float(latency_us.max()), 1),
+        },
+        "gestures": per,
+        "total": total,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded gesture sessions through the recognizer")
+    parser.add_argument("sessions", nargs="*", help=".npz landmark sessions or video clips")
+    parser.add_argument("--labels", help="JSON labels for a single video clip")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="add the generated session (harness check, its scores are not accuracy)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the generated session")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--min-recall", type=float, help="exit 1 if overall recall is below this")
+    parser.add_argument("--min-precision", type=float, help="exit 1 if overall precision is below this")
+    args = parser.parse_args(argv)
+
+    sessions = [load_session(p, args.labels) for p in args.sessions]
+    synthetic = args.synthetic or not sessions
+    if synthetic:
+        sessions.append(synthetic_session(seed=args.seed))
+        print("note: scores include the generated session; they check the harness, "
+              "record real sessions for accuracy", file=sys.stderr)
+
+    report = benchmark(sessions, args.tolerance)
+    report["synthetic"] = synthetic
+    print(json.dumps(report, indent=2))
+
+    total = report["total"]
+    if args.min_recall is not None and (total["recall"] or 0) < args.min_recall:
+        return 1
+    if args.min_precision is not None and (total["precision"] or 0) < args.min_precision:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
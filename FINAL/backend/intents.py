@@ -0,0 +1,231 @@
+# backend/intents.py
+#
+# Voice command grammar, declared as data and compiled into a token trie.
+# match(text) finds the best rule anywhere in the utterance in one pass and
+# returns (intent, slots). Rules match whole words only, so "prev" no longer
+# fires inside "previous"; the earliest match wins, so a keyword inside a
+# song title ("play next to me") is part of the name; and at the same start
+# longer phrases beat their prefixes, so "stop listening" is never "stop".
+#
+#   python -m backend.intents          # corpus check + micro-benchmark
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend import command_bus as cb
+
+VOICE_OFF = "voice_off"     # handled by voice_control itself, not the bus
+
+# ---------------- GRAMMAR ----------------
+# (phrase, intent, slots). A trailing "{name}" captures the rest of the
+# utterance. When several rules match, the one starting earliest wins, then
+# the one with more fixed words, then the one listed first. A captured slot
+# that is itself a whole command ("play the next song") runs that command.
+# SLOT_FILLERS are skipped before that check.
+GRAMMAR = [
+    ("stop listening", VOICE_OFF, {}),
+    ("voice off", VOICE_OFF, {}),
+
+    ("spotify next", cb.SPOTIFY_NEXT, {"target": "spotify"}),
+    ("spotify previous", cb.SPOTIFY_PREV, {"target": "spotify"}),
+    ("spotify prev", cb.SPOTIFY_PREV, {"target": "spotify"}),
+    ("spotify play", cb.SPOTIFY_PLAY, {"target": "spotify"}),
+    ("spotify stop", cb.SPOTIFY_STOP, {"target": "spotify"}),
+    ("spotify pause", cb.SPOTIFY_STOP, {"target": "spotify"}),
+
+    ("next song", cb.NEXT, {"target": "local"}),
+    ("next", cb.NEXT, {"target": "local"}),
+    ("previous song", cb.PREV, {"target": "local"}),
+    ("previous", cb.PREV, {"target": "local"}),
+    ("prev", cb.PREV, {"target": "local"}),
+    ("pause song", cb.PAUSE, {"target": "local"}),
+    ("pause", cb.PAUSE, {"target": "local"}),
+    ("stop", cb.PAUSE, {"target": "local"}),
+    ("volume up", cb.VOLUME_UP, {"target": "local"}),
+    ("volume down", cb.VOLUME_DOWN, {"target": "local"}),
+
+    ("play {name}", cb.PLAY_BY_NAME, {"target": "local"}),
+    ("play", cb.PLAY, {"target": "local"}),
+]
+
+SLOT_FILLERS = ("the", "a", "my")
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class IntentMatcher:
+    # Token trie compiled from a grammar. Each node is
+    #   {"next": {token: node}, "rule": (rank, intent, slots) | None,
+    #    "capture": (rank, intent, slots, slot_name) | None}
+    # match() walks the trie from every token position, so the work is
+    # O(tokens x phrase depth) no matter how many rules there are.
+
+    def __init__(self, grammar=GRAMMAR):
+        self.grammar = list(grammar)
+        self.root = self._node()
+        for order, (phrase, intent, slots) in enumerate(self.grammar):
+            self._add(phrase, intent, slots, order)
+
+    @staticmethod
+    def _node():
+        return {"next": {}, "rule": None, "capture": None}
+
+    def _add(self, phrase, intent, slots, order):
+        words = phrase.split()
+        capture = None
+        if words and words[-1].startswith("{") and words[-1].endswith("}"):
+            capture = words.pop()[1:-1]
+        if not words:
+            raise ValueError(f"rule needs at least one fixed word: {phrase!r}")
+        node = self.root
+        for word in words:
+            node = node["next"].setdefault(word, self._node())
+        # more fixed words first, then grammar order
+        rank = (len(words), -order)
+        if capture:
+            if node["capture"] is None or rank > node["capture"][0]:
+                node["capture"] = (rank, intent, slots, capture)
+        elif node["rule"] is None or rank > node["rule"][0]:
+            node["rule"] = (rank, intent, slots)
+
+    def _exact(self, tokens):
+        # rule covering exactly these tokens, or None
+        node = self.root
+        for token in tokens:
+            node = node["next"].get(token)
+            if node is None:
+                return None
+        return node["rule"]
+
+    def match(self, text):
+        # -> (intent, slots) or None
+        tokens = tokenize(text)
+        best = None
+        best_slots = None
+        for start in range(len(tokens)):
+            if best is not None:
+                break             # an earlier start always wins
+            node = self.root
+            i = start
+            while i < len(tokens):
+                node = node["next"].get(tokens[i])
+                if node is None:
+                    break
+                i += 1
+                rule = node["rule"]
+                if rule is not None and (best is None or rule[0] > best[0]):
+                    best, best_slots = rule, None
+                capture = node["capture"]
+                if capture is not None and i < len(tokens) and (best is None or capture[0] > best[0]):
+                    best, best_slots = capture, {capture[3]: " ".join(tokens[i:])}
+        if best is None:
+            return None
+        if best_slots:
+            # "play the next song": the slot is a command, not a title
+            words = next(iter(best_slots.values())).split()
+            while words and words[0] in SLOT_FILLERS:
+                words.pop(0)
+            rule = self._exact(words)
+            if rule is not None:
+                best, best_slots = rule, None
+        slots = dict(best[2])
+        if best_slots:
+            slots.update(best_slots)
+        return best[1], slots
+
+    def phrases(self):
+        # fixed words of every rule, for grammar-constrained recognizers
+        return sorted({" ".join(w for w in p.split() if not w.startswith("{")) for p, _, _ in self.grammar})
+
+
+matcher = IntentMatcher()
+
+
+def match(text):
+    return matcher.match(text)
+
+
+# ---------------- CORPUS ----------------
+# utterance (after the wake word) -> expected (intent, slots); None = no intent
+CORPUS = [
+    ("next song", (cb.NEXT, {"target": "local"})),
+    ("next", (cb.NEXT, {"target": "local"})),
+    ("play the next song", (cb.NEXT, {"target": "local"})),
+    ("previous song", (cb.PREV, {"target": "local"})),
+    ("go to previous", (cb.PREV, {"target": "local"})),
+    ("prev", (cb.PREV, {"target": "local"})),
+    ("pause", (cb.PAUSE, {"target": "local"})),
+    ("pause song", (cb.PAUSE, {"target": "local"})),
+    ("stop", (cb.PAUSE, {"target": "local"})),
+    ("stop listening", (VOICE_OFF, {})),
+    ("please stop listening now", (VOICE_OFF, {})),
+    ("voice off", (VOICE_OFF, {})),
+    ("spotify next", (cb.SPOTIFY_NEXT, {"target": "spotify"})),
+    ("spotify previous", (cb.SPOTIFY_PREV, {"target": "spotify"})),
+    ("spotify prev", (cb.SPOTIFY_PREV, {"target": "spotify"})),
+    ("spotify play", (cb.SPOTIFY_PLAY, {"target": "spotify"})),
+    ("spotify stop", (cb.SPOTIFY_STOP, {"target": "spotify"})),
+    ("volume up", (cb.VOLUME_UP, {"target": "local"})),
+    ("play", (cb.PLAY, {"target": "local"})),
+    ("play sitaare", (cb.PLAY_BY_NAME, {"target": "local", "name": "sitaare"})),
+    ("play kesariya tera", (cb.PLAY_BY_NAME, {"target": "local", "name": "kesariya tera"})),
+    ("play first song", (cb.PLAY_BY_NAME, {"target": "local", "name": "first song"})),
+    ("play random song", (cb.PLAY_BY_NAME, {"target": "local", "name": "random song"})),
+    ("Play, Apna Bana Le!", (cb.PLAY_BY_NAME, {"target": "local", "name": "apna bana le"})),
+    # whole words only: none of these are commands any more
+    ("player", None),
+    ("previously on the show", None),
+    # keywords inside a title belong to the title
+    ("play next to me", (cb.PLAY_BY_NAME, {"target": "local", "name": "next to me"})),
+    ("play some previous hits", (cb.PLAY_BY_NAME, {"target": "local", "name": "some previous hits"})),
+    ("play song next door", (cb.PLAY_BY_NAME, {"target": "local", "name": "song next door"})),
+    ("play stop and go", (cb.PLAY_BY_NAME, {"target": "local", "name": "stop and go"})),
+    ("play next", (cb.NEXT, {"target": "local"})),
+    ("nextdoor", None),
+    ("display", None),
+    ("", None),
+]
+
+
+def check_corpus(m=None):
+    m = m or matcher
+    failures = []
+    for text, expected in CORPUS:
+        got = m.match(text)
+        if got != expected:
+            failures.append((text, expected, got))
+    return failures
+
+
+def benchmark(m=None, rounds=2000):
+    m = m or matcher
+    texts = [t for t, _ in CORPUS]
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for t in texts:
+            m.match(t)
+    return (time.perf_counter() - t0) / (rounds * len(texts)) * 1e6
+
+
+def main():
+    failures = check_corpus()
+    for text, expected, got in failures:
+        print(f"FAIL {text!r}: expected {expected}, got {got}")
+    print(f"corpus: {len(CORPUS) - len(failures)}/{len(CORPUS)} ok")
+
+    # cost must not grow with the number of commands
+    big = IntentMatcher(GRAMMAR + [(f"custom command {i}", f"custom_{i}", {}) for i in range(5000)])
+    print(f"match: {benchmark():.1f} us/utterance with {len(GRAMMAR)} rules, "
+          f"{benchmark(big, 500):.1f} us with {len(big.grammar)} rules")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+# backend/library.py
+import base64
+import bisect
+import gzip
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from backend.song_index import normalize
+
+# ---------------- CONFIG ----------------
+AUDIO_EXTS = (".mp3", ".wav")     # one list for the player and /api/songs
+POLL_SECONDS = float(os.environ.get("LIBRARY_POLL", 2.0))
+WATCHDOG_POLL_SECONDS = 30.0      # safety re-check when filesystem events are on
+PAGE_LIMIT = 200                  # /api/songs default page size
+MAX_PAGE_LIMIT = 1000
+PAGE_CACHE = 256                  # serialised pages kept per snapshot
+ORDER_CACHE = 32                  # filtered orderings (one per search string) per snapshot
+SORTS = ("index", "name", "-name")
+
+
+class Snapshot:
+    # Immutable view of the library at one version. songs[i] (absolute
+    # path) and names[i] (path relative to the music folder, "/"-separated,
+    # what /songs/<name> serves) are the same track, so UI indices and
+    # player indices always agree. Never mutate one; Library swaps in a new
+    # snapshot instead. Orderings and serialised pages are memoised on the
+    # snapshot, so they live exactly as long as its version.
+
+    __slots__ = ("version", "root", "songs", "names", "positions", "_norms",
+                 "_orders", "_filtered", "_pages", "_lock")
+
+    def __init__(self, version, root, songs, names, norms=None):
+        self.version = version
+        self.root = root
+        self.songs = tuple(songs)
+        self.names = tuple(names)
+        self.positions = {path: i for i, path in enumerate(self.songs)}
+        self._norms = tuple(norms) if norms is not None else None
+        self._orders = {}                 # q-less sorts, kept for the snapshot's life
+        self._filtered = OrderedDict()    # (q, sort) -> order, LRU of ORDER_CACHE
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.songs)
+
+    @property
+    def norms(self):
+        # normalised names for ?q= filtering; built once per snapshot, and
+        # Library._publish carries them over so only new files are normalised
+        if self._norms is None:
+            self._norms = tuple(normalize(n) for n in self.names)
+        return self._norms
+
+    def _order(self, q, sort):
+        # -> (song indices in display order, sort keys for bisecting)
+        key = (q, sort)
+        cache = self._filtered if q else self._orders
+        order = cache.get(key)
+        if order is not None and q:
+            cache.move_to_end(key)
+        if order is None:
+            ids = range(len(self.names))
+            if q:
+                needle = normalize(q)
+                norms = self.norms
+                ids = [i for i in ids if needle in norms[i]]
+            if sort == "index":
+                ids = list(ids)
+                keys = ids
+            else:
+                # (name, index): unique even when names differ only in case
+                ids = sorted(ids, key=lambda i: (self.names[i].lower(), i), reverse=sort == "-name")
+                keys = [(self.names[i].lower(), i) for i in ids]
+                if sort == "-name":
+                    keys = keys[::-1]      # ascending copy for bisect
+            order = cache[key] = (ids, keys)
+            if q and len(cache) > ORDER_CACHE:
+                cache.popitem(last=False)
+        return order
+
+    def _start(self, ids, keys, sort, cursor):
+        # cursor = "offset:index:name" of the last song already sent. The
+        # song's current index is used when it still exists; otherwise the
+        # offset (index sort) or the index it had (name sorts)
+        if not cursor:
+            return 0
+        try:
+            offset, index, last = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 2)
+            offset, index = int(offset), int(index)
+        except Exception:
+            raise ValueError("bad cursor")
+        i = self.positions.get(os.path.join(self.root, *last.split("/")))
+        if sort == "index":
+            if i is not None:
+                return bisect.bisect_right(keys, i)
+            return min(offset, len(ids))
+        key = (last.lower(), i if i is not None else index)
+        k = bisect.bisect_right(keys, key)
+        return k if sort == "name" else len(keys) - bisect.bisect_left(keys, key)
+
+    def page(self, q="", sort="index", cursor=None, limit=PAGE_LIMIT):
+        # -> (etag, json bytes, gzip bytes or None); cached per snapshot
+        if sort not in SORTS:
+            raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+        limit = max(1, min(int(limit), MAX_PAGE_LIMIT))
+        ck = (q, sort, cursor, limit)
+        with self._lock:
+            hit = self._pages.get(ck)
+            if hit is not None:
+                self._pages.move_to_end(ck)
+                return hit
+            ids, keys = self._order(q, sort)
+            start = self._start(ids, keys, sort, cursor)
+            chunk = ids[start:start + limit]
+            next_cursor = None
+            if start + limit < len(ids):
+                last = chunk[-1]
+                token = f"{start + len(chunk)}:{last}:{self.names[last]}"
+                next_cursor = base64.urlsafe_b64encode(token.encode()).decode()
+            body = json.dumps({
+                "version": self.version,
+                "total": len(ids),
+                "songs": [{"index": i, "name": self.names[i]} for i in chunk],
+                "next_cursor": next_cursor,
+            }).encode()
+            etag = f"{self.version}-{zlib.crc32(body):08x}"
+            entry = (etag, body, gzip.compress(body, 5) if len(body) > 1024 else None)
+            self._pages[ck] = entry
+            if len(self._pages) > PAGE_CACHE:
+                self._pages.popitem(last=False)
+            return entry
+
+
+class Library:
+    # One recursive scan at start, then incremental updates: a poll thread
+    # stats only the known directories and re-lists just the ones whose
+    # mtime moved (adding a file never rescans the tree). With watchdog
+    # installed, file create/delete events add or drop just that entry and
+    # wake the thread straight away; directory and move events (and the
+    # periodic safety check) fall back to re-listing the directory.
+    # Subscribers get (snapshot, added, removed).
+
+    def __init__(self, root, exts=AUDIO_EXTS, poll_seconds=POLL_SECONDS):
+        self.root = os.path.abspath(root)
+        self.exts = tuple(e.lower() for e in exts)
+        self.poll_seconds = poll_seconds
+        self._dirs = {}              # dir -> mtime
+        self._files = {}             # dir -> set of audio paths directly in it
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._dirty = set()          # dirs to re-list
+        self._touched = set()        # single files named by watchdog events
+        self._subscribers = []
+        self._thread = None
+        self._observer = None
+        self._running = False
+        self.rescans = 0
+        self.snapshot = Snapshot(0, self.root, (), ())
+        self.scan()
+
+    def _name(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _is_audio(self, name):
+        return name.lower().endswith(self.exts)
+
+    # ---------- scanning ----------
+    def _list_dir(self, d):
+        # -> (audio files, subdirs) directly inside d; records its mtime
+        files, subdirs = set(), []
+        try:
+            self._dirs[d] = os.stat(d).st_mtime_ns
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif self._is_audio(entry.name):
+                        files.add(entry.path)
+        except OSError:
+            self._dirs.pop(d, None)
+        return files, subdirs
+
+    def _walk(self, top):
+        added = []
+        stack = [top]
+        while stack:
+            d = stack.pop()
+            files, subdirs = self._list_dir(d)
+            self._files[d] = files
+            added.extend(files)
+            stack.extend(subdirs)
+        return added
+
+    def _forget(self, top):
+        # directory gone: drop it and everything under it
+        removed = []
+        prefix = top + os.sep
+        for d in [d for d in self._files if d == top or d.startswith(prefix)]:
+            removed.extend(self._files.pop(d))
+            self._dirs.pop(d, None)
+        return removed
+
+    def scan(self):
+        # full recursive scan; normally only run once at start
+        with self._lock:
+            self._dirs.clear()
+            self._files.clear()
+            songs = sorted(self._walk(self.root), key=lambda p: self._name(p).lower())
+            self.rescans += 1
+            self.snapshot = Snapshot(
+                self.snapshot.version + 1, self.root, songs, [self._name(p) for p in songs]
+            )
+        return self.snapshot
+
+    def _rescan_dir(self, d):
+        # one directory changed: diff its listing against what we had
+        if not os.path.isdir(d):
+            return [], self._forget(d)
+        old = self._files.get(d, set())
+        files, subdirs = self._list_dir(d)
+        self._files[d] = files
+        added = sorted(files - old)
+        removed = list(old - files)
+        for sub in subdirs:
+            if sub not in self._files:
+                added.extend(sorted(self._walk(sub)))
+        prefix = d + os.sep
+        live = set(subdirs)
+        for known in [k for k in self._files if k.startswith(prefix) and os.path.dirname(k) == d]:
+            if known not in live:
+                removed.extend(self._forget(known))
+        return added, removed
+
+    def _apply_files(self, paths):
+        # one stat per file instead of re-listing its directory
+        # -> (added, removed, dirs that still need a rescan)
+        added, removed, fallback = [], [], set()
+        for p in paths:
+            d = os.path.dirname(p)
+            files = self._files.get(d)
+            if files is None:
+                fallback.add(d)          # directory we have not listed yet
+                continue
+            present = self._is_audio(p) and os.path.isfile(p)
+            if present and p not in files:
+                files.add(p)
+                added.append(p)
+            elif not present and p in files:
+                files.discard(p)
+                removed.append(p)
+            try:
+                self._dirs[d] = os.stat(d).st_mtime_ns   # so the safety poll skips it
+            except OSError:
+                fallback.add(d)
+        return sorted(added), removed, fallback
+
+    def refresh(self, dirs=None, files=None):
+        # re-list changed directories (all known ones whose mtime moved, or
+        # the given dirs), apply single-file changes, and publish a new
+        # snapshot if anything changed
+        with self._lock:
+            if dirs is None and files is None:
+                dirs = []
+                for d, mtime in list(self._dirs.items()):
+                    try:
+                        if os.stat(d).st_mtime_ns != mtime:
+                            dirs.append(d)
+                    except OSError:
+                        dirs.append(d)
+            added, removed = [], []
+            dirs = set(dirs or ())
+            if files:
+                added, removed, fallback = self._apply_files(files)
+                dirs |= fallback
+            for d in sorted(dirs):
+                if d in self._files or os.path.isdir(d):
+                    a, r = self._rescan_dir(d)
+                    added += a
+                    removed += r
+            if not added and not removed:
+                return None
+            snapshot = self._publish(added, removed)
+        for fn in list(self._subscribers):
+            try:
+                fn(snapshot, added, removed)
+            except Exception as e:
+                print("Library subscriber error:", e)
+        return snapshot
+
+    def _publish(self, added, removed):
+        # new files go to the end so existing indices stay put
+        old = self.snapshot
+        old_norms = old._norms           # only carried over if already built
+        gone = set(removed)
+        if gone:
+            keep = [i for i, p in enumerate(old.songs) if p not in gone]
+            songs = [old.songs[i] for i in keep]
+            names = [old.names[i] for i in keep]
+            norms = [old_norms[i] for i in keep] if old_norms is not None else None
+        else:
+            songs, names = list(old.songs), list(old.names)
+            norms = list(old_norms) if old_norms is not None else None
+        known = old.positions
+        for p in added:
+            if p not in known:
+                songs.append(p)
+                name = self._name(p)
+                names.append(name)
+                if norms is not None:
+                    norms.append(normalize(name))
+        self.snapshot = Snapshot(old.version + 1, self.root, songs, names, norms)
+        return self.snapshot
+
+    # ---------- watching ----------
+    def subscribe(self, fn):
+        self._subscribers.append(fn)
+
+    def _mark_dirty(self, path):
+        d = path if os.path.isdir(path) else os.path.dirname(path)
+        self._dirty.add(d)
+        self._dirty.add(os.path.dirname(d))   # covers a directory that was just removed
+        self._wake.set()
+
+    def _mark_file(self, path):
+        self._touched.add(path)
+        self._wake.set()
+
+    def _start_observer(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return None
+
+        library = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type == "moved":
+                    library._mark_dirty(event.src_path)
+                    library._mark_dirty(event.dest_path)
+                elif not event.is_directory:
+                    library._mark_file(event.src_path)
+                elif event.event_type in ("created", "deleted"):
+                    library._mark_dirty(event.src_path)
+                # directory "modified" just echoes a file event we already have
+
+        observer = Observer()
+        observer.schedule(Handler(), self.root, recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def _watch(self):
+        while self._running:
+            interval = WATCHDOG_POLL_SECONDS if self._observer else self.poll_seconds
+            woke = self._wake.wait(interval)
+            if not self._running:
+                break
+            self._wake.clear()
+            dirty, self._dirty = self._dirty, set()
+            touched, self._touched = self._touched, set()
+            try:
+                # with events only the dirty dirs / touched files; timeouts
+                # fall back to mtimes
+                inside = self.root + os.sep
+                known = [d for d in dirty if d == self.root or d.startswith(inside)]
+                files = [p for p in touched if p.startswith(inside)]
+                if woke and (known or files):
+                    self.refresh(known, files)
+                else:
+                    self.refresh()
+            except Exception as e:
+                print("Library refresh error:", e)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        try:
+            self._observer = self._start_observer()
+        except Exception as e:
+            print("Library watcher unavailable, polling instead:", e)
+            self._observer = None
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        self._thread = None
+
+    def stats(self):
+        snap = self.snapshot
+        return {
+            "version": snap.version,
+            "songs": len(snap),
+            "directories": len(self._dirs),
+            "watcher": "watchdog" if self._observer else "poll",
+            "poll_seconds": self.poll_seconds,
+        }
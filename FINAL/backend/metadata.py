@@ -0,0 +1,362 @@
+# backend/metadata.py
+#
+# Header-only metadata extraction for the library: ID3v2/ID3v1 + the first
+# MPEG frame (and its Xing/VBRI header) for .mp3, RIFF fmt/data/LIST-INFO
+# chunks for .wav. Audio is never decoded; a typical file costs a few KB
+# of reads. index_library() fans files out over a process pool and writes
+# the results into the songs table in batched transactions.
+#
+#   python -m backend.metadata [--workers 8] [--batch 500] [--force]
+import argparse
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# ---------------- CONFIG ----------------
+BATCH_SIZE = 500
+CHUNK_SIZE = 64           # files per task sent to a worker
+MAX_TEXT_FRAME = 4096     # longest ID3 text frame we bother reading
+SYNC_SEARCH = 64 * 1024   # bytes after the tag searched for the first MPEG frame
+
+# ---------------- MP3 ----------------
+ID3_FIELDS = {
+    "TIT2": "tag_title", "TPE1": "artist", "TALB": "album", "TLEN": "tlen",
+    "TT2": "tag_title", "TP1": "artist", "TAL": "album", "TLE": "tlen",   # ID3v2.2
+}
+BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 25: (11025, 12000, 8000)}
+
+
+def _synchsafe(b):
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+
+def _text(data):
+    # ID3 text frame: encoding byte + payload
+    if not data:
+        return None
+    enc, raw = data[0], data[1:]
+    try:
+        if enc == 0:
+            value = raw.decode("latin-1")
+        elif enc == 1:
+            value = raw.decode("utf-16")
+        elif enc == 2:
+            value = raw.decode("utf-16-be")
+        else:
+            value = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    value = value.split("\x00")[0].strip()
+    return value or None
+
+
+def _read_id3v2(f, meta):
+    # -> offset where the audio starts
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    major, flags = header[3], header[5]
+    end = 10 + _synchsafe(header[6:10]) + (10 if flags & 0x10 else 0)
+    pos = 10
+    if flags & 0x40 and major >= 3:
+        ext = f.read(4)
+        pos += (_synchsafe(ext) if major == 4 else struct.unpack(">I", ext)[0] + 4)
+        f.seek(pos)
+    id_len, head_len = (3, 6) if major == 2 else (4, 10)
+    while pos + head_len <= end:
+        fh = f.read(head_len)
+        if len(fh) < head_len or fh[0] == 0:
+            break                       # padding
+        frame_id = fh[:id_len].decode("latin-1", "replace")
+        if major == 2:
+            size = int.from_bytes(fh[3:6], "big")
+        elif major == 4:
+            size = _synchsafe(fh[4:8])
+        else:
+            size = struct.unpack(">I", fh[4:8])[0]
+        pos += head_len
+        field = ID3_FIELDS.get(frame_id)
+        if field and size <= MAX_TEXT_FRAME and field not in meta:
+            meta[field] = _text(f.read(size))
+        else:
+            f.seek(size, 1)             # skip pictures, lyrics, ...
+        pos += size
+    return end
+
+
+def _read_id3v1(f, meta, size):
+    if size < 128:
+        return 0
+    f.seek(size - 128)
+    tag = f.read(128)
+    if tag[:3] != b"TAG":
+        return 0
+    for field, raw in (("tag_title", tag[3:33]), ("artist", tag[33:63]), ("album", tag[63:93])):
+        if not meta.get(field):
+            value = raw.split(b"\x00")[0].decode("latin-1").strip()
+            meta[field] = value or None
+    return 128
+
+
+def _parse_frame_header(h):
+    # -> (version, layer, bitrate kbps, sample rate, channels, samples per frame) or None
+    if h[0] != 0xFF or (h[1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (h[1] >> 3) & 3
+    layer_bits = (h[1] >> 1) & 3
+    bitrate_idx = h[2] >> 4
+    rate_idx = (h[2] >> 2) & 3
+    if version_bits == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    version = {3: 1, 2: 2, 0: 25}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = BITRATES[(1 if version == 1 else 2, layer)][bitrate_idx]
+    sample_rate = SAMPLE_RATES[version][rate_idx]
+    channels = 1 if (h[3] >> 6) == 3 else 2
+    if layer == 1:
+        spf = 384
+    elif layer == 3 and version != 1:
+        spf = 576
+    else:
+        spf = 1152
+    return version, layer, bitrate, sample_rate, channels, spf
+
+
+def _read_mpeg(f, meta, start, size, tail):
+    f.seek(start)
+    buf = f.read(SYNC_SEARCH)
+    i = buf.find(b"\xff")
+    while 0 <= i < len(buf) - 4:
+        info = _parse_frame_header(buf[i:i + 4])
+        if info:
+            break
+        i = buf.find(b"\xff", i + 1)
+    else:
+        return
+    version, layer, bitrate, sample_rate, channels, spf = info
+    meta.update(bitrate=bitrate, sample_rate=sample_rate, channels=channels)
+
+    # VBR files carry the real frame count in a Xing/Info or VBRI header
+    if version == 1:
+        side = 32 if channels == 2 else 17
+    else:
+        side = 17 if channels == 2 else 9
+    frames = None
+    xing = buf[i + 4 + side:i + 4 + side + 12]
+    if xing[:4] in (b"Xing", b"Info") and struct.unpack(">I", xing[4:8])[0] & 1:
+        frames = struct.unpack(">I", xing[8:12])[0]
+    vbri = buf[i + 36:i + 36 + 18]
+    if frames is None and vbri[:4] == b"VBRI":
+        frames = struct.unpack(">I", vbri[14:18])[0]
+
+    audio_bytes = size - start - i - tail
+    if frames:
+        meta["duration"] = frames * spf / sample_rate
+        if meta["duration"] > 0:
+            meta["bitrate"] = int(round(audio_bytes * 8 / meta["duration"] / 1000))
+    elif bitrate:
+        meta["duration"] = audio_bytes * 8 / (bitrate * 1000)
+
+
+def read_mp3(path):
+    meta = {}
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = _read_id3v2(f, meta)
+        tail = _read_id3v1(f, meta, size)
+        _read_mpeg(f, meta, start, size, tail)
+    tlen = meta.pop("tlen", None)
+    if not meta.get("duration") and tlen and tlen.isdigit():
+        meta["duration"] = int(tlen) / 1000.0
+    return meta
+
+
+# ---------------- WAV ----------------
+RIFF_INFO = {b"INAM": "tag_title", b"IART": "artist", b"IPRD": "album"}
+
+
+def read_wav(path):
+    meta = {}
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            raise ValueError("not a RIFF/WAVE file")
+        byte_rate = None
+        while True:
+            ch = f.read(8)
+            if len(ch) < 8:
+                break
+            cid, size = ch[:4], struct.unpack("<I", ch[4:])[0]
+            if cid == b"fmt ":
+                fmt = f.read(size)
+                _, channels, sample_rate, byte_rate = struct.unpack("<HHII", fmt[:12])
+                meta.update(channels=channels, sample_rate=sample_rate,
+                            bitrate=int(round(byte_rate * 8 / 1000)))
+            elif cid == b"data":
+                if byte_rate:
+                    meta["duration"] = size / byte_rate
+                f.seek(size, 1)
+            elif cid == b"LIST" and size <= 64 * 1024:
+                data = f.read(size)
+                if data[:4] == b"INFO":
+                    k = 4
+                    while k + 8 <= len(data):
+                        sub, n = data[k:k + 4], struct.unpack("<I", data[k + 4:k + 8])[0]
+                        if sub in RIFF_INFO:
+                            value = data[k + 8:k + 8 + n].split(b"\x00")[0].decode("latin-1").strip()
+                            meta[RIFF_INFO[sub]] = value or None
+                        k += 8 + n + (n & 1)
+            else:
+                f.seek(size, 1)
+            if size & 1:
+                f.seek(1, 1)            # chunks are word aligned
+    return meta
+
+
+READERS = {".mp3": read_mp3, ".wav": read_wav}
+
+
+def read_metadata(path):
+    # -> dict of Song columns (missing keys = unknown)
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError("unsupported file type")
+    meta = reader(path)
+    for field in ("tag_title", "artist", "album"):
+        if meta.get(field):
+            meta[field] = meta[field][:200]
+    if meta.get("duration") is not None:
+        meta["duration"] = round(meta["duration"], 3)
+    return meta
+
+
+def _extract(job):
+    # runs in a worker process
+    path, size, mtime = job
+    try:
+        meta = read_metadata(path)
+    except Exception as e:
+        return path, size, mtime, None, str(e)
+    return path, size, mtime, meta, None
+
+
+# ---------------- INDEXER ----------------
+META_COLUMNS = ("artist", "album", "tag_title", "duration", "bitrate", "sample_rate", "channels")
+
+
+def index_library(app, db, song_paths, base_dir, workers=None, batch_size=BATCH_SIZE, force=False, progress=True):
+    # song_paths: absolute paths (library.snapshot.songs). Rows are matched on
+    # file_path, stored as "music/<name>" relative to base_dir like add_songs.
+    from sqlalchemy import bindparam
+    from sqlalchemy.dialects.sqlite import insert
+    from backend.models import Song
+
+    table = Song.__table__
+    t0 = time.perf_counter()
+    with app.app_context():
+        known = {
+            row.file_path: (row.file_size, row.file_mtime)
+            for row in db.session.execute(
+                db.select(table.c.file_path, table.c.file_size, table.c.file_mtime)
+            )
+        }
+
+    jobs = []
+    skipped = 0
+    for path in song_paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        key = os.path.relpath(path, base_dir).replace(os.sep, "/")
+        if not force and known.get(key) == (st.st_size, st.st_mtime):
+            skipped += 1
+            continue
+        jobs.append((path, st.st_size, st.st_mtime))
+
+    update = (
+        table.update()
+        .where(table.c.file_path == bindparam("key"))
+        .values({c: bindparam(c) for c in META_COLUMNS + ("file_size", "file_mtime")})
+    )
+    # file_path is unique: a row add_songs (or another run) inserted since
+    # `known` was read is skipped, not an IntegrityError for the whole batch
+    insert_new = insert(table).on_conflict_do_nothing(index_elements=["file_path"])
+    updates, inserts = [], []
+    done = errors = 0
+
+    def flush():
+        with app.app_context():
+            if updates:
+                db.session.execute(update, updates)
+            if inserts:
+                db.session.execute(insert_new, inserts)
+            db.session.commit()
+        updates.clear()
+        inserts.clear()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, size, mtime, meta, error in pool.map(_extract, jobs, chunksize=CHUNK_SIZE):
+            done += 1
+            if error:
+                errors += 1
+                meta = {}
+            key = os.path.relpath(path, base_dir).replace(os.sep, "/")
+            row = {c: meta.get(c) for c in META_COLUMNS}
+            row.update(file_size=size, file_mtime=mtime)
+            if key in known:
+                row["key"] = key
+                updates.append(row)
+            else:
+                row.update(title=os.path.basename(path), file_path=key, liked=False)
+                inserts.append(row)
+            if len(updates) + len(inserts) >= batch_size:
+                flush()
+                if progress:
+                    rate = done / (time.perf_counter() - t0)
+                    print(f"  {done}/{len(jobs)} files, {rate:.0f} files/s")
+    flush()
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "files": len(song_paths),
+        "indexed": done,
+        "skipped_unchanged": skipped,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "files_per_sec": round(done / elapsed, 1) if elapsed else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read audio headers into the songs table")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--force", action="store_true", help="re-read files even if size+mtime match")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("GESTURE_PREWARM", "0")   # no hand model needed here
+    from backend.app import app, db, library, BASE_DIR
+
+    report = index_library(app, db, library.snapshot.songs, BASE_DIR,
+                           workers=args.workers, batch_size=args.batch, force=args.force)
+    print(f"✅ {report['indexed']} indexed, {report['skipped_unchanged']} unchanged, "
+          f"{report['errors']} unreadable in {report['seconds']}s "
+          f"({report['files_per_sec']} files/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 # backend/models.py
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -15,9 +16,78 @@ class User(db.Model):
 
 class Song(db.Model):
     __tablename__ = "songs"
+    # one row per file; add_songs.py relies on it for ON CONFLICT DO NOTHING
+    __table_args__ = (db.Index("ix_songs_file_path", "file_path", unique=True),)
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     file_path = db.Column(db.String(300), nullable=False)
     liked = db.Column(db.Boolean, default=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # filled by backend/metadata.py from the file headers
+    artist = db.Column(db.String(200))
+    album = db.Column(db.String(200))
+    tag_title = db.Column(db.String(200))
+    duration = db.Column(db.Float)          # seconds
+    bitrate = db.Column(db.Integer)         # kbps
+    sample_rate = db.Column(db.Integer)
+    channels = db.Column(db.Integer)
+    file_size = db.Column(db.Integer)       # size + mtime decide whether to re-read
+    file_mtime = db.Column(db.Float)
+
+
+# columns added after the first release: create_all() never alters an
+# existing table, so older database.db files get them here
+SONG_COLUMNS = {
+    "artist": "VARCHAR(200)",
+    "album": "VARCHAR(200)",
+    "tag_title": "VARCHAR(200)",
+    "duration": "FLOAT",
+    "bitrate": "INTEGER",
+    "sample_rate": "INTEGER",
+    "channels": "INTEGER",
+    "file_size": "INTEGER",
+    "file_mtime": "FLOAT",
+}
+
+
+def upgrade_schema():
+    existing = {row[1] for row in db.session.execute(text("PRAGMA table_info(songs)"))}
+    for name, ddl in SONG_COLUMNS.items():
+        if name not in existing:
+            db.session.execute(text(f"ALTER TABLE songs ADD COLUMN {name} {ddl}"))
+    indexes = {row[1] for row in db.session.execute(text("PRAGMA index_list(songs)"))}
+    if "ix_songs_file_path" not in indexes:
+        # old imports could add the same file twice; fold each group into its first row
+        merge_duplicate_songs()
+        db.session.execute(text("CREATE UNIQUE INDEX ix_songs_file_path ON songs (file_path)"))
+    db.session.commit()
+
+
+def merge_duplicate_songs():
+    dups = db.session.execute(text(
+        "SELECT file_path FROM songs GROUP BY file_path HAVING COUNT(*) > 1"
+    )).scalars().all()
+    for path in dups:
+        rows = [dict(r) for r in db.session.execute(
+            text("SELECT * FROM songs WHERE file_path = :p ORDER BY id"), {"p": path}
+        ).mappings()]
+        keep, extra = rows[0], rows[1:]
+        merged = {
+            "liked": any(r["liked"] for r in rows),
+            "user_id": next((r["user_id"] for r in rows if r["user_id"] is not None), None),
+        }
+        # metadata: freshest read wins, column by column
+        fresh = sorted(rows, key=lambda r: (r["file_mtime"] is not None, r["file_mtime"] or 0),
+                       reverse=True)
+        for name in SONG_COLUMNS:
+            merged[name] = next((r[name] for r in fresh if r[name] is not None), None)
+        sets = ", ".join(f"{name} = :{name}" for name in merged)
+        db.session.execute(text(f"UPDATE songs SET {sets} WHERE id = :id"), {**merged, "id": keep["id"]})
+        ids = [r["id"] for r in extra]
+        db.session.execute(
+            text(f"DELETE FROM songs WHERE id IN ({', '.join(str(i) for i in ids)})")
+        )
+        print(f"Merged duplicate rows {ids} into song {keep['id']} ({path})")
+    return len(dups)
@@ -0,0 +1,88 @@
+# backend/motion_gate.py
+import threading
+import time
+import cv2
+import numpy as np
+
+# ---------------- CONFIG ----------------
+GATE_SIZE = (160, 120)     # frames are compared at this size, in grayscale
+PIXEL_DELTA = 15           # grey levels a pixel must change to count as moving
+MOTION_THRESHOLD = 0.01    # fraction of moving pixels that wakes inference
+BACKGROUND_ALPHA = 0.5     # how fast the reference frame follows the scene
+HAND_HOLD = 1.5            # s to keep inferring after a hand was last seen
+HEARTBEAT = 1.0            # s between inferences even in a static scene
+
+
+class MotionGate:
+    # Cheap pre-filter in front of HandLandmarker.detect_async.
+    # A static scene costs one resize + absdiff per frame instead of a full
+    # landmark pass; motion, a recently seen hand or the heartbeat
+    # (which catches a hand that is already holding still) reopen the gate.
+
+    def __init__(self, threshold=MOTION_THRESHOLD, hold=HAND_HOLD, heartbeat=HEARTBEAT):
+        self.threshold = threshold
+        self.hold = hold
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._background = None
+            self._hand_seen_at = -1e9
+            self._last_infer = -1e9
+            self.inferred = 0
+            self.skipped = 0
+            self.motion = 0.0
+            self.gate_s = 0.0
+            self._wall0 = time.perf_counter()
+            self._cpu0 = time.process_time()
+
+    def hand_seen(self, now):
+        self._hand_seen_at = now
+
+    def should_infer(self, frame, now):
+        t0 = time.perf_counter()
+        small = cv2.resize(frame, GATE_SIZE, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32)
+
+        if self._background is None:
+            self._background = gray
+            moving = 1.0
+        else:
+            diff = cv2.absdiff(gray, self._background)
+            moving = float(np.count_nonzero(diff > PIXEL_DELTA)) / diff.size
+            cv2.accumulateWeighted(gray, self._background, BACKGROUND_ALPHA)
+
+        infer = (
+            moving >= self.threshold
+            or now - self._hand_seen_at < self.hold
+            or now - self._last_infer >= self.heartbeat
+        )
+        with self._lock:
+            self.motion = moving
+            self.gate_s += time.perf_counter() - t0
+            if infer:
+                self.inferred += 1
+                self._last_infer = now
+            else:
+                self.skipped += 1
+        return infer
+
+    def report(self, infer_ms=None):
+        # infer_ms: measured cost of one landmark pass, used to estimate savings
+        with self._lock:
+            frames = self.inferred + self.skipped
+            wall = time.perf_counter() - self._wall0
+            out = {
+                "inferred": self.inferred,
+                "skipped": self.skipped,
+                "skip_ratio": round(self.skipped / frames, 3) if frames else 0.0,
+                "motion": round(self.motion, 4),
+                "gate_ms_per_frame": round(self.gate_s * 1000 / frames, 3) if frames else 0.0,
+                "process_cpu_percent": round(100 * (time.process_time() - self._cpu0) / wall, 1) if wall else 0.0,
+            }
+            if infer_ms is not None:
+                saved = self.skipped * infer_ms / 1000 - self.gate_s
+                out["est_cpu_saved_s"] = round(max(0.0, saved), 2)
+        return out
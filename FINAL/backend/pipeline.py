@@ -0,0 +1,84 @@
+# backend/pipeline.py
+import threading
+import time
+
+# Small building blocks for the threaded gesture pipeline.
+
+
+class LatestSlot:
+    # Single-slot, drop-oldest buffer between two pipeline stages.
+    # put() never blocks: a newer frame simply replaces one the consumer
+    # has not picked up yet, so the slow stage always sees the freshest data.
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._has_item = False
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._has_item:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._has_item and not self._closed:
+                self._cond.wait(timeout)
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    # Per-stage FPS and latency, smoothed with an EMA so reading is O(1).
+    #   work_ms    - time spent inside the stage for one frame
+    #   latency_ms - capture time -> end of this stage
+
+    ALPHA = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.frames = 0
+            self.fps = 0.0
+            self.work_ms = 0.0
+            self.latency_ms = 0.0
+            self._last = None
+
+    def record(self, work_s, latency_s=None):
+        now = time.perf_counter()
+        with self._lock:
+            a = self.ALPHA if self.frames else 1.0
+            if self._last is not None and now > self._last:
+                fps = 1.0 / (now - self._last)
+                self.fps = fps if self.frames < 2 else self.fps + self.ALPHA * (fps - self.fps)
+            self._last = now
+            self.work_ms += a * (work_s * 1000 - self.work_ms)
+            if latency_s is not None:
+                self.latency_ms += a * (latency_s * 1000 - self.latency_ms)
+            self.frames += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "fps": round(self.fps, 1),
+                "work_ms": round(self.work_ms, 2),
+                "latency_ms": round(self.latency_ms, 2),
+            }
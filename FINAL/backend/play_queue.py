@@ -0,0 +1,516 @@
+# backend/play_queue.py
+#
+# Play order for the local player.
+#
+# Entries (one per queued track, the same song may appear twice) get an
+# integer id and live in a doubly linked list kept in two dicts, so
+# enqueue, remove, "play next" and move-after are O(1) whatever the queue
+# length. Positions (what the UI pages through) come from a lazily built
+# id -> position index: appends keep it valid, anything in the middle just
+# drops it and the next page() rebuilds it in one O(n) walk.
+#
+# Shuffle is a lazy Fisher-Yates bag over the same entries: only the
+# tracks actually played get drawn, each at most once per round, and the
+# drawn prefix doubles as shuffle history for prev. "random song" draws
+# from the same bag, so it never repeats until everything has had a turn.
+#
+# The queue is saved as JSON (song paths relative to the music folder) so
+# it survives restarts.
+#
+#   python -m backend.play_queue            # 100k-entry benchmark
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# ---------------- CONFIG ----------------
+QUEUE_PATH = os.environ.get(
+    "QUEUE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "queue.json")
+)
+SAVE_SECONDS = 2.0        # min gap between two saves of a changing queue
+PAGE_LIMIT = 200
+MAX_PAGE_LIMIT = 1000
+
+
+class ShuffleBag:
+    # Lazy Fisher-Yates. arr[:k] is the order drawn so far this round,
+    # arr[k:] is still undecided; cursor points at the entry now playing.
+    # Removed entries become None (tombstones) and are compacted away once
+    # they outnumber the live ones.
+
+    def __init__(self, ids=(), rng=None):
+        self.arr = list(ids)
+        self.pos = {e: i for i, e in enumerate(self.arr)}
+        self.k = 0
+        self.cursor = -1
+        self.dead = 0
+        self.rng = rng or random.Random()
+
+    def __len__(self):
+        return len(self.arr) - self.dead
+
+    def add(self, e):
+        self.pos[e] = len(self.arr)
+        self.arr.append(e)
+
+    def remove(self, e):
+        p = self.pos.pop(e, None)
+        if p is None:
+            return
+        self.arr[p] = None
+        self.dead += 1
+        if self.dead > 64 and self.dead > len(self):
+            self._compact()
+
+    def _compact(self):
+        arr, k, cursor = [], 0, -1
+        for i, e in enumerate(self.arr):
+            if e is None:
+                continue
+            if i < self.k:
+                k += 1
+            if i <= self.cursor:
+                cursor = len(arr)
+            arr.append(e)
+        self.arr, self.k, self.cursor, self.dead = arr, k, cursor, 0
+        self.pos = {e: i for i, e in enumerate(arr)}
+
+    def _swap(self, i, j):
+        a, b = self.arr[i], self.arr[j]
+        self.arr[i], self.arr[j] = b, a
+        if a is not None:
+            self.pos[a] = j
+        if b is not None:
+            self.pos[b] = i
+
+    def _draw(self):
+        # decide one more slot; None once the round is exhausted
+        n = len(self.arr)
+        while self.k < n:
+            self._swap(self.k, self.rng.randrange(self.k, n))
+            self.k += 1
+            if self.arr[self.k - 1] is not None:
+                return self.k - 1
+        return None
+
+    def _forward(self):
+        # index of the entry after cursor, drawing if we are at the frontier
+        i = self.cursor + 1
+        while i < self.k and self.arr[i] is None:
+            i += 1
+        return i if i < self.k else self._draw()
+
+    def peek(self):
+        i = self._forward()
+        return None if i is None else self.arr[i]
+
+    def next(self):
+        i = self._forward()
+        if i is None:
+            # round over: everything is undecided again
+            if not len(self):
+                return None
+            self.k, self.cursor = 0, -1
+            i = self._draw()
+        self.cursor = i
+        return self.arr[i]
+
+    def _back(self):
+        i = self.cursor - 1
+        while i >= 0 and self.arr[i] is None:
+            i -= 1
+        return i
+
+    def peek_prev(self):
+        i = self._back()
+        return self.arr[i] if i >= 0 else None
+
+    def prev(self):
+        i = self._back()
+        if i < 0:
+            return None
+        self.cursor = i
+        return self.arr[i]
+
+    def jump(self, e):
+        # make e the current entry; an undecided one is drawn on the spot
+        p = self.pos.get(e)
+        if p is None:
+            return
+        if p >= self.k:
+            self._swap(p, self.k)
+            self.k += 1
+            p = self.k - 1
+        self.cursor = p
+
+    def state(self):
+        # -> (drawn ids in order, cursor into that list) without tombstones
+        order, cursor = [], -1
+        for i in range(self.k):
+            e = self.arr[i]
+            if e is not None:
+                if i <= self.cursor:
+                    cursor = len(order)
+                order.append(e)
+        return order, cursor
+
+
+class PlayQueue:
+    def __init__(self, paths=(), path=QUEUE_PATH, rng=None):
+        self.file = path
+        self._lock = threading.RLock()
+        self._next = {0: 0}          # 0 is the sentinel: _next[0] = head
+        self._prev = {0: 0}          #                    _prev[0] = tail
+        self._path = {}              # entry id -> song path
+        self._by_path = {}           # song path -> set of entry ids
+        self._seq = 0
+        self._order = []             # lazy position index, None when stale
+        self._index = {}
+        self.current = None          # entry id now playing
+        self.shuffle = False
+        self.bag = ShuffleBag(rng=rng)
+        self.version = 0
+        self._saved = 0
+        self._save_at = 0.0
+        self.extend(paths)
+
+    def __len__(self):
+        return len(self._path)
+
+    # ---------- linked list ----------
+    def _link(self, e, after):
+        nxt = self._next[after]
+        self._next[after] = e
+        self._prev[e] = after
+        self._next[e] = nxt
+        self._prev[nxt] = e
+
+    def _unlink(self, e):
+        p, n = self._prev.pop(e), self._next.pop(e)
+        self._next[p] = n
+        self._prev[n] = p
+
+    def _touch(self, appended=None):
+        # appended: the new tail ids, which keep the position index valid
+        self.version += 1
+        if appended is None:
+            self._order = None
+        elif self._order is not None:
+            for e in appended:
+                self._index[e] = len(self._order)
+                self._order.append(e)
+
+    def _positions(self):
+        if self._order is None:
+            order = []
+            e = self._next[0]
+            while e:
+                order.append(e)
+                e = self._next[e]
+            self._order = order
+            self._index = {e: i for i, e in enumerate(order)}
+        return self._order
+
+    # ---------- editing ----------
+    def extend(self, paths, after=None):
+        # enqueue paths at the end, or right after entry `after` ("play next")
+        with self._lock:
+            ids = []
+            at = self._prev[0] if after is None else after
+            if at not in self._next:
+                raise KeyError(at)
+            tail = at == self._prev[0]
+            for p in paths:
+                self._seq += 1
+                e = self._seq
+                self._link(e, at)
+                self._path[e] = p
+                self._by_path.setdefault(p, set()).add(e)
+                self.bag.add(e)
+                ids.append(e)
+                at = e
+            if ids:
+                self._touch(ids if tail else None)
+            return ids
+
+    def remove(self, e):
+        with self._lock:
+            if e not in self._path:
+                raise KeyError(e)
+            if e == self.current:
+                # the song keeps playing; next/prev go on from its neighbour
+                self.current = self._prev[e] or None
+            self._unlink(e)
+            p = self._path.pop(e)
+            ids = self._by_path[p]
+            ids.discard(e)
+            if not ids:
+                del self._by_path[p]
+            self.bag.remove(e)
+            self._touch()
+
+    def remove_path(self, path):
+        with self._lock:
+            for e in list(self._by_path.get(path, ())):
+                self.remove(e)
+
+    def move(self, e, after=None, position=None):
+        # put e right after entry `after` (0 = front), or at a position
+        with self._lock:
+            if e not in self._path:
+                raise KeyError(e)
+            if position is not None:
+                order = self._positions()
+                position = max(0, min(int(position), len(order) - 1))
+                target = order[position]
+                if target == e:
+                    return
+                after = self._prev[target] if self._index[target] < self._index[e] else target
+            if after is None:
+                after = self._prev[0]
+            if after != 0 and after not in self._path:
+                raise KeyError(after)
+            if after == e:
+                return
+            self._unlink(e)
+            self._link(e, after)
+            self._touch()
+
+    # ---------- playback order ----------
+    @property
+    def current_path(self):
+        return self._path.get(self.current)
+
+    def _linear(self, e, step):
+        # neighbour in queue order, wrapping round the ends
+        link = self._next if step > 0 else self._prev
+        e = link[e or 0] or link[0]
+        return e or None
+
+    def peek(self, step=1):
+        # the song advance(step) would land on, without moving; None if unsure
+        with self._lock:
+            if self.shuffle:
+                e = self.bag.peek() if step > 0 else self.bag.peek_prev()
+            else:
+                e = self._linear(self.current, step)
+            return self._path.get(e)
+
+    def advance(self, step=1):
+        # move `step` entries forward/back -> the new current song path
+        with self._lock:
+            if not self._path:
+                return None
+            for _ in range(abs(step)):
+                if self.shuffle:
+                    e = self.bag.next() if step > 0 else self.bag.prev()
+                    if e is None:
+                        break
+                else:
+                    e = self._linear(self.current, step)
+                self.current = e
+            self._changed()
+            return self.current_path
+
+    def random(self):
+        # a song not picked before this round, remembered in the bag
+        with self._lock:
+            e = self.bag.next()
+            if e is None:
+                return None
+            self.current = e
+            self._changed()
+            return self.current_path
+
+    def jump(self, e):
+        with self._lock:
+            if e not in self._path:
+                raise KeyError(e)
+            self.current = e
+            self.bag.jump(e)
+            self._changed()
+            return self.current_path
+
+    def jump_path(self, path):
+        # make path the current song; queued right after the current one if absent
+        with self._lock:
+            if self.current_path == path:
+                return self.current
+            ids = self._by_path.get(path)
+            if ids:
+                e = min(ids)
+            else:
+                e = self.extend([path], after=self.current or self._prev[0])[0]
+            self.jump(e)
+            return e
+
+    def set_shuffle(self, on):
+        with self._lock:
+            self.shuffle = bool(on)
+            if self.shuffle and self.current is not None:
+                self.bag.jump(self.current)
+            self._changed()
+
+    def _changed(self):
+        self.version += 1
+
+    # ---------- reading ----------
+    def page(self, offset=0, limit=PAGE_LIMIT):
+        with self._lock:
+            order = self._positions()
+            offset = max(0, int(offset))
+            limit = max(1, min(int(limit), MAX_PAGE_LIMIT))
+            return {
+                "total": len(order),
+                "offset": offset,
+                "current": self.current,
+                "position": self._index.get(self.current),
+                "shuffle": self.shuffle,
+                "items": [{"id": e, "path": self._path[e]} for e in order[offset:offset + limit]],
+            }
+
+    def stats(self):
+        return {"entries": len(self), "shuffle": self.shuffle,
+                "shuffle_drawn": self.bag.k, "version": self.version}
+
+    # ---------- persistence ----------
+    def to_dict(self, name=lambda p: p):
+        with self._lock:
+            order = self._positions()
+            slot = self._index
+            drawn, cursor = self.bag.state()
+            return {
+                "songs": [name(self._path[e]) for e in order],
+                "current": slot.get(self.current),
+                "shuffle": self.shuffle,
+                "shuffle_order": [slot[e] for e in drawn],
+                "shuffle_cursor": cursor,
+            }
+
+    def save(self, name=lambda p: p):
+        # atomic: a crash mid-write leaves the previous file in place. The
+        # lock keeps the player's periodic save and a shutdown save from
+        # interleaving; the temp name is unique for the same reason
+        with self._lock:
+            data = self.to_dict(name)
+            fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.file) + ".",
+                                       suffix=".tmp", dir=os.path.dirname(self.file) or ".")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp, self.file)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            self._saved = self.version
+
+    def save_if_dirty(self, name=lambda p: p, now=None):
+        now = time.monotonic() if now is None else now
+        if self.version == self._saved or now < self._save_at or not self.file:
+            return False
+        self._save_at = now + SAVE_SECONDS
+        try:
+            self.save(name)
+        except OSError as e:
+            print("Queue save failed:", e)
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path=QUEUE_PATH, resolve=lambda n: n, default=None):
+        # resolve(name) -> song path or None (song gone). default is the
+        # library order: the whole queue when there is no file, otherwise
+        # songs added while we were stopped are appended to the saved one
+        q = cls(path=path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            q.extend(default or ())
+            return q
+        paths = [resolve(n) for n in data.get("songs", [])]
+        ids = q.extend([p for p in paths if p is not None])
+        slot, live = [], iter(ids)
+        for p in paths:
+            slot.append(next(live) if p is not None else None)
+        cur = data.get("current")
+        if cur is not None and 0 <= cur < len(slot) and slot[cur] is not None:
+            q.current = slot[cur]
+        # replay the drawn shuffle prefix so history and "no repeats" survive
+        drawn = [slot[i] for i in data.get("shuffle_order", []) if 0 <= i < len(slot) and slot[i] is not None]
+        for e in drawn:
+            q.bag.jump(e)
+        c = data.get("shuffle_cursor", -1)
+        if 0 <= c < len(drawn):
+            q.bag.cursor = q.bag.pos[drawn[c]]
+        q.shuffle = bool(data.get("shuffle"))
+        q._saved = q.version
+        if default is not None:
+            q.reconcile(default)
+        return q
+
+    def reconcile(self, paths):
+        # make the queue hold every song in paths and nothing else: missing
+        # ones go to the end (library order), unknown ones are dropped
+        with self._lock:
+            paths = list(paths)
+            live = set(paths)
+            for p in [p for p in self._by_path if p not in live]:
+                self.remove_path(p)
+            self.extend([p for p in paths if p not in self._by_path])
+
+
+# ---------------- BENCHMARK ----------------
+def benchmark(n=100_000, ops=10_000, seed=1):
+    rng = random.Random(seed)
+    paths = [f"/music/track_{i:06d}.mp3" for i in range(n)]
+    out = {"entries": n}
+
+    t = time.perf_counter()
+    q = PlayQueue(paths, path=None, rng=random.Random(seed))
+    out["build_ms"] = round((time.perf_counter() - t) * 1000, 1)
+
+    def timed(name, fn):
+        t = time.perf_counter()
+        for _ in range(ops):
+            fn()
+        out[name] = round((time.perf_counter() - t) / ops * 1e6, 2)
+
+    ids = list(q._path)
+    timed("play_next_us", lambda: q.extend(["/music/extra.mp3"], after=rng.choice(ids)))
+    timed("move_us", lambda: q.move(rng.choice(ids), after=rng.choice(ids)))
+    victims = iter(rng.sample(ids, ops))
+    timed("remove_us", lambda: q.remove(next(victims)))
+    q.set_shuffle(True)
+    seen = set()
+    timed("shuffle_next_us", lambda: (q.advance(1), seen.add(q.current)))
+    out["shuffle_repeats"] = ops - len(seen)
+    timed("advance_linear_us", lambda: q._linear(q.current, 1))
+
+    t = time.perf_counter()
+    q.page(n // 2, 200)
+    out["page_after_edit_ms"] = round((time.perf_counter() - t) * 1000, 1)
+    t = time.perf_counter()
+    q.page(n // 2, 200)
+    out["page_cached_ms"] = round((time.perf_counter() - t) * 1000, 3)
+
+    import tempfile
+    q.file = os.path.join(tempfile.mkdtemp(), "queue.json")
+    t = time.perf_counter()
+    q.save()
+    out["save_ms"] = round((time.perf_counter() - t) * 1000, 1)
+    t = time.perf_counter()
+    r = PlayQueue.load(q.file)
+    out["load_ms"] = round((time.perf_counter() - t) * 1000, 1)
+    out["restored_ok"] = (r.current_path == q.current_path and len(r) == len(q)
+                          and r.shuffle and r.bag.k == len(seen))
+    return out
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(json.dumps(benchmark(n), indent=2))
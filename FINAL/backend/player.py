@@ -1,26 +1,246 @@
 # backend/player.py
+import io
+import os
+import threading
+import time
 import pygame
 from backend.spotify_control import SpotifyController
+from backend import command_bus as cb
+from backend.song_index import SongIndex
+from backend.pipeline import StageStats
+from backend.audio_cache import AudioCache
+from backend.play_queue import PlayQueue, QUEUE_PATH
+
+TICK_SECONDS = 0.25      # how often the idle player checks the queue / track end
+INIT_TIMEOUT = 10        # seconds start_worker waits for the mixer to come up
+
+# the mixer only posts its end event when SDL video is up; the dummy driver
+# gives us an event queue on a headless box without a window. Set once here,
+# before anything in the process initialises SDL
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+MUSIC_END = pygame.USEREVENT + 1   # posted by the mixer when a track finishes
+PLAY_ACTIONS = frozenset(["skip", cb.PLAY, cb.PLAY_INDEX, cb.PLAY_BY_NAME])
 
 class MusicPlayer:
-    def __init__(self, local_songs=[], spotify_controller=None):
+    def __init__(self, local_songs=[], spotify_controller=None, library=None, queue_path=QUEUE_PATH):
+        # with a Library the song list follows its snapshots
+        self.library = library
+        self._snapshot = None            # library snapshot local_songs came from
+        if library is not None:
+            self._snapshot = library.snapshot
+            local_songs = self._snapshot.songs
+            library.subscribe(self._library_changed)
         self.local_songs = local_songs
+        self._positions = {s: i for i, s in enumerate(local_songs)}
+        self.index = SongIndex({s: os.path.basename(s) for s in local_songs})
+
+        # play order: saved queue if there is one, else the library order
+        if queue_path:
+            self.queue = PlayQueue.load(queue_path, self._resolve, default=local_songs)
+        else:
+            self.queue = PlayQueue(local_songs, path=None)
         self.current_index = 0
         self.is_playing = False
         self.volume = 0.5
 
-        # Initialize pygame mixer
-        pygame.mixer.init()
+        # pygame mixer is initialised by the worker thread that owns it
         self.spotify = spotify_controller
-        
+        self.worker = None
+        self.bus = None
+
+        # recently played and upcoming tracks are kept in memory: the cache's
+        # warm-up thread reads them, the player thread hands the next one to
+        # mixer.music.queue so a natural end rolls straight into it, and
+        # skips/back-skips/first/last jumps load from memory instead of disk
+        self.cache = AudioCache()
+        self._queued = None              # path currently in mixer.music.queue
+        self._listeners = []             # fn(event, data) on track changes
+        self.skip_stats = StageStats()   # work = load+play, latency = input -> audio
+
+        # coalesced actions (see command_bus.coalesce) -> player calls
+        self._handlers = {
+            "skip": self.skip,
+            "volume": self.change_volume,
+            cb.PLAY: self.play,
+            cb.PAUSE: self.pause,
+            cb.PLAY_INDEX: self.play_index,
+            cb.PLAY_BY_NAME: self.play_by_name,
+            cb.LIKE: self.like,
+            cb.DISLIKE: self.dislike,
+            cb.SPOTIFY_PLAY: self.play_spotify,
+            cb.SPOTIFY_STOP: self.stop_spotify,
+            cb.SPOTIFY_NEXT: self.next_spotify,
+            cb.SPOTIFY_PREV: self.prev_spotify,
+            cb.LIBRARY_CHANGED: self._sync_library,
+        }
+
+    # -------- Player worker (owns the mixer) --------
+    def start_worker(self, bus):
+        # the worker owns the mixer, so it does the init; we wait for it and
+        # raise here, at startup, instead of leaving a dead thread behind
+        # that never completes a ticket
+        if self.worker is not None:
+            return
+        self.bus = bus
+        ready = threading.Event()
+        failed = []
+        self.worker = threading.Thread(target=self._consume, args=(bus, ready, failed), daemon=True)
+        self.worker.start()
+        if not ready.wait(INIT_TIMEOUT):
+            failed.append(TimeoutError(f"mixer init took over {INIT_TIMEOUT}s"))
+        if failed:
+            self.worker = None
+            raise RuntimeError(f"Audio player could not start: {failed[0]}") from failed[0]
+
+    def _consume(self, bus, ready, failed):
+        try:
+            pygame.display.init()
+            pygame.mixer.init()
+            pygame.mixer.music.set_endevent(MUSIC_END)
+        except Exception as e:
+            failed.append(e)
+            return
+        finally:
+            ready.set()
+        self._warm_neighbours()
+        while True:
+            # block for one command, then take whatever piled up behind it;
+            # wake up every tick anyway to keep the mixer queue fed
+            cmd = bus.get(timeout=TICK_SECONDS)
+            batch = [cmd] + bus.drain() if cmd is not None else bus.drain()
+            for action, args, cmds in cb.coalesce(batch):
+                *merged, last = cmds
+                try:
+                    t0 = time.perf_counter()
+                    result = self._handlers[action](**args)
+                    if action in PLAY_ACTIONS and result is not None:
+                        now = time.perf_counter()
+                        self.skip_stats.record(now - t0, now - last.created)
+                except Exception as e:
+                    print("Player command error:", action, args, e)
+                    for cmd in cmds:
+                        bus.complete(cmd, error=str(e))
+                    continue
+                for cmd in merged:
+                    bus.complete(cmd, result, state=cb.COALESCED, notify=False)
+                bus.complete(last, result)
+            try:
+                self._tick()
+            except Exception as e:
+                print("Player queue error:", e)
+
+    # -------- Play queue --------
+    def _name(self, path):
+        # queue file stores paths relative to the music folder
+        return self.library._name(path) if self.library is not None else path
+
+    def _resolve(self, name):
+        path = os.path.join(self.library.root, *name.split("/")) if self.library is not None else name
+        return path if path in self._positions else None
+
+    def _goto(self, path):
+        if path is None:
+            return None
+        self.current_index = self._positions.get(path, self.current_index)
+        return self.play()
+
+    # -------- Read-ahead / gapless queue --------
+    def _next_path(self):
+        return self.queue.peek(1)
+
+    def _warm_neighbours(self):
+        # next/prev in queue order plus the first/last songs the voice shortcuts jump to
+        songs = self.local_songs
+        if not songs:
+            return
+        for path in (self.queue.peek(1), self.queue.peek(-1), songs[0], songs[-1]):
+            self.cache.warm(path)
+
+    def _source(self, path):
+        # -> args for music.load / music.queue: cached bytes if we have them.
+        # A miss plays straight from disk and reads the file in the background
+        data = self.cache.get(path)
+        if data is not None:
+            return io.BytesIO(data), os.path.splitext(path)[1].lstrip(".")
+        self.cache.warm(path)
+        return (path,)
+
+    # -------- Track events --------
+    def subscribe(self, fn):
+        # fn(event, data) runs on the player thread; keep it short
+        self._listeners.append(fn)
+
+    def _emit(self, event):
+        data = {
+            "index": self.current_index,
+            "song": os.path.basename(self.local_songs[self.current_index]) if self.local_songs else None,
+            "playing": self.is_playing,
+        }
+        for fn in self._listeners:
+            try:
+                fn(event, data)
+            except Exception as e:
+                print("Player listener error:", e)
+
+    def _track_ended(self):
+        if self._queued is not None:
+            # the mixer already rolled into the queued track, just catch up
+            if self.queue.advance(1) != self._queued:
+                self.queue.jump_path(self._queued)   # queue edited since it was queued
+            self.current_index = self._positions.get(self._queued, self.current_index)
+            self._queued = None
+            self._emit("track")
+        elif self.is_playing and self.local_songs:
+            # nothing was queued in time (next file still loading): advance by hand
+            self.skip(1)
+            self._emit("track")
+        else:
+            self.is_playing = False
+            self._emit("ended")
+
+    def _tick(self):
+        # player thread only: handle end events, then once the next track
+        # is in memory hand it to the mixer queue
+        for _ in pygame.event.get(MUSIC_END):
+            self._track_ended()
+        if self.library is not None and self.library.snapshot is not self._snapshot:
+            self._sync_library()     # the library_changed command was dropped
+        self.queue.save_if_dirty(self._name)
+        if not self.is_playing or not self.local_songs:
+            return
+        path = self._next_path()
+        if path is None or path == self._queued:
+            return
+        # queue once it is in memory (or will never be: too big for the cache)
+        if self.cache.contains(path) or not (self.cache.pending(path) or self.cache.fits(path)):
+            pygame.mixer.music.queue(*self._source(path))   # replaces any older queue entry
+            self._queued = path
+        else:
+            self.cache.warm(path)
+
+    def stats(self):
+        queued = self._queued
+        return {
+            "skip": self.skip_stats.snapshot(),
+            "cache": self.cache.stats(),
+            "queue": self.queue.stats(),
+            "queued": os.path.basename(queued) if queued else None,
+        }
+
     # -------- Local song methods --------
     def play(self):
         if not self.local_songs:
             return
-        pygame.mixer.music.load(self.local_songs[self.current_index])
+        path = self.local_songs[self.current_index]
+        self.queue.jump_path(path)       # no-op when the queue already points here
+        pygame.mixer.music.load(*self._source(path))
         pygame.mixer.music.set_volume(self.volume)
         pygame.mixer.music.play()
         self.is_playing = True
+        self._queued = None          # load() dropped whatever was queued
+        pygame.event.clear(MUSIC_END)  # an end from the old track is stale now
+        self._warm_neighbours()
+        return self.current_index
 
     def pause(self):
         pygame.mixer.music.pause()
@@ -31,23 +251,91 @@ class MusicPlayer:
         self.is_playing = True
 
     def next_song(self):
-        if not self.local_songs:
-            return
-        self.current_index = (self.current_index + 1) % len(self.local_songs)
-        self.play()
+        return self.skip(1)
 
     def prev_song(self):
+        return self.skip(-1)
+
+    def skip(self, offset):
+        # one load() no matter how many next/prev were folded into offset
         if not self.local_songs:
-            return
-        self.current_index = (self.current_index - 1 + len(self.local_songs)) % len(self.local_songs)
-        self.play()
+            return None
+        if offset == 0:
+            return self.current_index
+        return self._goto(self.queue.advance(offset))
+
+    def play_index(self, index):
+        if index < 0 or index >= len(self.local_songs):
+            return None
+        self.current_index = index
+        return self.play()
+
+    def play_by_name(self, name):
+        name = name.lower().strip()
+        if not self.local_songs:
+            return None
+
+        # ----- SPECIAL COMMANDS -----
+        if name == "last song":
+            return self.play_index(len(self.local_songs) - 1)
+        if name == "first song":
+            return self.play_index(0)
+        if name == "random song":
+            # shuffle bag: no repeats until every queued song has come up
+            return self._goto(self.queue.random())
+
+        index = self.find_song(name)
+        if index is None:
+            return None
+        return self.play_index(index)
+
+    def find_song(self, name):
+        # ----- FUZZY + HALF MATCH -----
+        # trigram index over the titles, best-scoring song or None
+        path = self.index.best(name)
+        return self._positions.get(path)
+
+    def _library_changed(self, snapshot, added, removed):
+        # runs on the library thread, which must not touch player state:
+        # hand the change to the player thread like any other command
+        bus = self.bus
+        if bus is not None:
+            bus.publish(cb.LIBRARY_CHANGED, source="library", version=snapshot.version)
+
+    def _sync_library(self, version=None):
+        # player thread: adopt the library's newest snapshot. The diff is
+        # taken against our own list, so coalesced or dropped
+        # library_changed commands lose nothing. Only the changed files
+        # touch the title index; the current song keeps playing and
+        # current_index follows it to its new slot.
+        snapshot = self.library.snapshot
+        if snapshot is self._snapshot:
+            return self.current_index
+        live = snapshot.positions
+        removed = [p for p in self.local_songs if p not in live]
+        added = [p for p in snapshot.songs if p not in self._positions]
+        for path in removed:
+            self.index.remove(path)
+            self.cache.discard(path)
+            self.queue.remove_path(path)
+        for path in added:
+            self.index.add(path, os.path.basename(path))
+        self.queue.extend(added)
+        current = self.local_songs[self.current_index] if self.current_index < len(self.local_songs) else None
+        self._snapshot = snapshot
+        self._positions = snapshot.positions
+        self.local_songs = snapshot.songs
+        self.current_index = snapshot.positions.get(current, min(self.current_index, max(0, len(snapshot) - 1)))
+        return self.current_index
 
     def volume_up(self):
-        self.volume = min(1.0, self.volume + 0.1)
-        pygame.mixer.music.set_volume(self.volume)
+        self.change_volume(1)
 
     def volume_down(self):
-        self.volume = max(0.0, self.volume - 0.1)
+        self.change_volume(-1)
+
+    def change_volume(self, steps):
+        self.volume = min(1.0, max(0.0, round(self.volume + 0.1 * steps, 2)))
         pygame.mixer.music.set_volume(self.volume)
 
     def like(self):
@@ -0,0 +1,133 @@
+# backend/speech_backends.py
+import json
+import os
+import threading
+from collections import deque
+import speech_recognition as sr
+
+# ---------------- CONFIG ----------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BACKEND = os.environ.get("VOICE_BACKEND", "google")
+VOSK_MODEL_PATH = os.environ.get(
+    "VOSK_MODEL", os.path.join(BASE_DIR, "models", "vosk-model-small-en-in-0.4")
+)
+SAMPLE_RATE = 16000
+
+
+class SpeechBackend:
+    # transcribe(audio: sr.AudioData) -> lower-case text.
+    # Raises sr.UnknownValueError when nothing was understood and
+    # sr.RequestError when the engine itself failed, like recognize_google.
+
+    name = "base"
+
+    def transcribe(self, audio):
+        raise NotImplementedError
+
+    def set_vocabulary(self, phrases):
+        # engines that can constrain decoding use this; others ignore it
+        pass
+
+
+class GoogleBackend(SpeechBackend):
+    # the original behaviour: free Google Web Speech API, needs network
+    name = "google"
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_google(audio).lower()
+
+
+class VoskBackend(SpeechBackend):
+    # Offline, CPU-only Kaldi decoder. With a vocabulary it decodes against
+    # a grammar of our command words and song titles only, which is both
+    # faster and far more accurate than open dictation for this job.
+    name = "vosk"
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        try:
+            import vosk
+        except ImportError:
+            raise sr.RequestError("vosk is not installed (pip install vosk)")
+        if not os.path.isdir(model_path):
+            raise sr.RequestError(f"vosk model not found: {model_path}")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+        self._grammar = None
+        self._lock = threading.Lock()
+
+    def set_vocabulary(self, phrases):
+        words = sorted({w for p in phrases for w in p.lower().split()})
+        with self._lock:
+            self._grammar = json.dumps(words + ["[unk]"]) if words else None
+
+    def transcribe(self, audio):
+        raw = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        with self._lock:
+            grammar = self._grammar
+        if grammar:
+            rec = self._vosk.KaldiRecognizer(self.model, SAMPLE_RATE, grammar)
+        else:
+            rec = self._vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+        rec.AcceptWaveform(raw)
+        text = json.loads(rec.FinalResult()).get("text", "")
+        text = " ".join(w for w in text.split() if w != "[unk]")
+        if not text:
+            raise sr.UnknownValueError()
+        return text.lower()
+
+
+class SphinxBackend(SpeechBackend):
+    # Offline fallback through pocketsphinx; keyword-spots the vocabulary
+    name = "sphinx"
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+        self._keywords = None
+
+    def set_vocabulary(self, phrases):
+        words = sorted({w for p in phrases for w in p.lower().split()})
+        self._keywords = [(w, 0.8) for w in words] or None
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_sphinx(audio, keyword_entries=self._keywords).lower().strip()
+
+
+class StubBackend(SpeechBackend):
+    # Scripted transcripts for tests: each transcribe() returns the next one
+    name = "stub"
+
+    def __init__(self, transcripts=()):
+        self.transcripts = deque(transcripts)
+        self.vocabulary = []
+        self.calls = 0
+
+    def push(self, text):
+        self.transcripts.append(text)
+
+    def set_vocabulary(self, phrases):
+        self.vocabulary = list(phrases)
+
+    def transcribe(self, audio):
+        self.calls += 1
+        if not self.transcripts:
+            raise sr.UnknownValueError()
+        return self.transcripts.popleft().lower()
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "vosk": VoskBackend,
+    "sphinx": SphinxBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend(name=None, **options):
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"unknown speech backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
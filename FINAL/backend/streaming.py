@@ -0,0 +1,271 @@
+# backend/streaming.py
+#
+# Audio file responses for /songs/<filename>.
+#
+# - single byte ranges (Range / If-Range) -> 206, bad ones -> 416
+# - strong ETag from size+mtime, Last-Modified, 304 on either validator
+# - long Cache-Control, Accept-Ranges on every response
+# - the body never sits in memory: full files and open-ended ranges
+#   ("bytes=N-", what browsers send on a seek) go through the server's
+#   wsgi.file_wrapper, which gunicorn & co. turn into sendfile(); bounded
+#   ranges, and servers without a wrapper, read CHUNK bytes at a time
+#
+#   python -m backend.streaming [streams] [file_mb]   # concurrency benchmark
+import mimetypes
+import os
+import re
+import sys
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from flask import Response, abort, request
+from werkzeug.security import safe_join
+
+# ---------------- CONFIG ----------------
+CHUNK = 64 * 1024           # max bytes read per iteration of a ranged body
+MAX_AGE = int(os.environ.get("STREAM_MAX_AGE", 7 * 24 * 3600))
+AUDIO_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav"}
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def etag_for(st):
+    # strong: size + mtime change whenever the bytes can have changed
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    # -> (start, end inclusive), None for "send everything", or ValueError
+    # for an unsatisfiable range. Multi-range requests get the whole file.
+    if not header:
+        return None
+    m = _RANGE.match(header.replace(" ", ""))
+    if not m:
+        return None
+    first, last = m.groups()
+    if first == "":
+        if last == "" or int(last) == 0:
+            raise ValueError(header)
+        start, end = max(0, size - int(last)), size - 1          # suffix: last N bytes
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _not_modified(st, etag):
+    inm = request.headers.get("If-None-Match")
+    if inm:
+        return inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]
+    ims = request.headers.get("If-Modified-Since")
+    if ims:
+        try:
+            return int(st.st_mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _range_allowed(st, etag):
+    # If-Range: only honour Range when the client's copy is still current
+    cond = request.headers.get("If-Range")
+    if not cond:
+        return True
+    if cond.startswith('"') or cond.startswith("W/"):
+        return cond == etag
+    try:
+        return int(st.st_mtime) <= parsedate_to_datetime(cond).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _read_range(path, start, length):
+    # opened lazily: a HEAD or an aborted request never touches the file
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(CHUNK, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def send_audio(root, filename, max_age=MAX_AGE):
+    # max_age=0 -> "no-cache": the client must revalidate every time
+    path = safe_join(root, filename)
+    if path is None:
+        abort(404)
+    try:
+        st = os.stat(path)
+    except OSError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+
+    size = st.st_size
+    etag = etag_for(st)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}" if max_age else "no-cache",
+    }
+    mimetype = AUDIO_TYPES.get(os.path.splitext(path)[1].lower()) \
+        or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if _not_modified(st, etag):
+        return Response(status=304, headers=headers)
+
+    try:
+        rng = parse_range(request.headers.get("Range"), size) if _range_allowed(st, etag) else None
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    start, end = rng if rng else (0, size - 1)
+    length = end - start + 1 if size else 0
+    headers["Content-Length"] = str(length)
+    status = 200
+    if rng:
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    wrapper = request.environ.get("wsgi.file_wrapper")
+    if request.method == "HEAD":
+        body = []
+    elif wrapper is not None and end == size - 1:
+        # runs to EOF, so the wrapper (sendfile) cannot overrun the range
+        f = open(path, "rb")
+        f.seek(start)
+        body = wrapper(f, CHUNK)
+    else:
+        body = _read_range(path, start, length)
+    return Response(body, status=status, headers=headers, mimetype=mimetype,
+                    direct_passthrough=True)
+
+
+# ---------------- BENCHMARK ----------------
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _write_wav(path, mb):
+    import wave
+    frames = mb * 1024 * 1024 // 4
+    block = os.urandom(64 * 1024)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(44100)
+        written = 0
+        while written < frames * 4:
+            w.writeframesraw(block)
+            written += len(block)
+
+
+def benchmark(streams=50, file_mb=64, files=4):
+    # threaded werkzeug server, `streams` clients each pulling a whole WAV
+    # (every 5th one seeks with an open range, every 7th asks for a bounded
+    # one); the same load is run against send_from_directory for comparison
+    import http.client
+    import tempfile
+    from flask import Flask, send_from_directory
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    root = tempfile.mkdtemp()
+    names = [f"track_{i}.wav" for i in range(files)]
+    for name in names:
+        _write_wav(os.path.join(root, name), file_mb)
+
+    app = Flask(__name__)
+    app.add_url_rule("/stream/<path:filename>", "stream", lambda filename: send_audio(root, filename))
+    app.add_url_rule("/default/<path:filename>", "default",
+                     lambda filename: send_from_directory(root, filename))
+
+    class Quiet(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=Quiet)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def run(prefix):
+        done = []
+        errors = []
+        peak = [_rss_mb()]
+        base = peak[0]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.is_set():
+                peak[0] = max(peak[0], _rss_mb())
+                time.sleep(0.02)
+
+        def client(i):
+            headers = {}
+            if i % 5 == 0:
+                headers["Range"] = f"bytes={file_mb * 1024 * 1024 // 2}-"
+            elif i % 7 == 0:
+                headers["Range"] = "bytes=1000000-9999999"
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                conn.request("GET", f"/{prefix}/{names[i % files]}", headers=headers)
+                resp = conn.getresponse()
+                n = 0
+                while True:
+                    data = resp.read(CHUNK)
+                    if not data:
+                        break
+                    n += len(data)
+                done.append((resp.status, n))
+                conn.close()
+            except Exception as e:
+                errors.append(str(e))
+
+        monitor = threading.Thread(target=sample, daemon=True)
+        monitor.start()
+        t = time.perf_counter()
+        clients = [threading.Thread(target=client, args=(i,)) for i in range(streams)]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        elapsed = time.perf_counter() - t
+        stop.set()
+        monitor.join()
+        total = sum(n for _, n in done)
+        return {
+            "streams": streams,
+            "ok": len(done),
+            "errors": errors[:3],
+            "partial_206": sum(1 for s, _ in done if s == 206),
+            "seconds": round(elapsed, 2),
+            "throughput_mb_s": round(total / elapsed / 1e6, 1),
+            "rss_growth_mb": round(peak[0] - base, 1),
+        }
+
+    report = {"file_mb": file_mb, "stream": run("stream"), "send_from_directory": run("default")}
+    server.shutdown()
+    for name in names:
+        os.remove(os.path.join(root, name))
+    os.rmdir(root)
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    streams = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    file_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    print(json.dumps(benchmark(streams, file_mb), indent=2))
@@ -0,0 +1,198 @@
+# backend/transcode.py
+#
+# Lower-bitrate variants for /songs/<filename>?quality=low.
+#
+# The first request for a (song, quality) pair queues an ffmpeg job on a
+# small worker pool and waits up to WAIT_SECONDS (half a second by
+# default, so a request thread is never parked behind ffmpeg) for it; if
+# it is not done by then the original is served and the variant is there
+# next time.
+# Variants live in CACHE_DIR, named by a hash of the song path, its size +
+# mtime and the quality, so editing a song simply misses the old variant.
+# The directory is an LRU under a byte cap: a hit bumps the file's mtime,
+# which also keeps the order across restarts. Repeat requests are a plain
+# file serve (see streaming.send_audio).
+#
+# ffmpeg is optional: without it every request gets the original.
+#
+#   python -m backend.transcode [quality]   # pre-build variants for the library
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import safe_join
+
+# ---------------- CONFIG ----------------
+QUALITIES = {
+    "low": ["-b:a", "64k", "-ac", "2", "-ar", "44100"],
+    "medium": ["-b:a", "128k", "-ac", "2", "-ar", "44100"],
+}
+CACHE_DIR = os.environ.get(
+    "TRANSCODE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcoded")
+)
+CACHE_BYTES = int(os.environ.get("TRANSCODE_CACHE_MB", 2048)) * 1024 * 1024
+WORKERS = int(os.environ.get("TRANSCODE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+WAIT_SECONDS = float(os.environ.get("TRANSCODE_WAIT", 0.5))
+FFMPEG = os.environ.get("FFMPEG", "ffmpeg")
+
+
+class Transcoder:
+    def __init__(self, source_root, cache_dir=CACHE_DIR, max_bytes=CACHE_BYTES, workers=WORKERS):
+        self.source_root = os.path.abspath(source_root)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ffmpeg = shutil.which(FFMPEG)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcode")
+        self._lock = threading.Lock()
+        self._jobs = {}              # variant name -> Future
+        self._files = OrderedDict()  # variant name -> size, oldest first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.transcodes = 0
+        self.failures = 0
+        self.evictions = 0
+        self.transcode_s = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def available(self):
+        return self.ffmpeg is not None
+
+    def _load(self):
+        # existing variants, least recently used first; stray temp files go
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(".part"):
+                    os.remove(entry.path)
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.bytes += size
+
+    def variant_name(self, filename, quality, st):
+        key = f"{filename}|{st.st_size}|{st.st_mtime_ns}|{quality}"
+        return hashlib.sha1(key.encode()).hexdigest()[:20] + f".{quality}.mp3"
+
+    def get(self, filename, quality, wait=WAIT_SECONDS):
+        # -> variant file name inside cache_dir, or None to serve the original
+        if quality not in QUALITIES:
+            raise ValueError(f"quality must be one of {', '.join(QUALITIES)}")
+        src = safe_join(self.source_root, filename)
+        if src is None or not self.available:
+            return None
+        try:
+            st = os.stat(src)
+        except OSError:
+            return None
+        name = self.variant_name(filename, quality, st)
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+                self.hits += 1
+                hit = True
+            else:
+                self.misses += 1
+                hit = False
+                job = self._jobs.get(name)
+                if job is None:
+                    job = self._jobs[name] = self._pool.submit(self._transcode, src, name, quality)
+        if hit:
+            try:
+                os.utime(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            return name
+        try:
+            return name if job.result(timeout=wait) else None
+        except TimeoutError:
+            return None
+
+    def _transcode(self, src, name, quality):
+        out = os.path.join(self.cache_dir, name)
+        tmp = out + ".part"
+        cmd = [self.ffmpeg, "-nostdin", "-v", "error", "-y", "-i", src, "-vn",
+               "-map_metadata", "0", *QUALITIES[quality], "-f", "mp3", tmp]
+        t = time.perf_counter()
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            os.replace(tmp, out)     # readers never see a half-written variant
+            size = os.path.getsize(out)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print("Transcode failed:", src, quality, getattr(e, "stderr", b"") or e)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            with self._lock:
+                self.failures += 1
+                self._jobs.pop(name, None)
+            return False
+        with self._lock:
+            self._files[name] = size
+            self.bytes += size
+            self.transcodes += 1
+            self.transcode_s += time.perf_counter() - t
+            self._jobs.pop(name, None)
+            self._evict()
+        return True
+
+    def _evict(self):
+        # caller holds the lock; never evicts the newest file
+        while self.bytes > self.max_bytes and len(self._files) > 1:
+            name, size = self._files.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            self.bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "ffmpeg": self.available,
+                "entries": len(self._files),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "pending": len(self._jobs),
+                "transcodes": self.transcodes,
+                "failures": self.failures,
+                "evictions": self.evictions,
+                "avg_transcode_s": round(self.transcode_s / self.transcodes, 2) if self.transcodes else None,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    import json
+    from backend.library import Library
+
+    quality = sys.argv[1] if len(sys.argv) > 1 else "low"
+    music = os.path.join(os.path.dirname(os.path.abspath(__file__)), "music")
+    library = Library(music)
+    transcoder = Transcoder(music)
+    if not transcoder.available:
+        print("❌ ffmpeg nahi mila, variants nahi banenge")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    for name in library.snapshot.names:
+        transcoder.get(name, quality, wait=0)     # queue everything, then let the pool drain
+    transcoder._pool.shutdown(wait=True)
+    print(json.dumps(transcoder.stats(), indent=2))
+    print(f"✅ {len(library.snapshot)} songs, {time.perf_counter() - t0:.1f}s")
@@ -1,35 +1,70 @@
 import time
 import threading
-import requests
 import speech_recognition as sr
+from backend.command_bus import bus
+from backend import command_bus as cb
+from backend.speech_backends import create_backend
+from backend.pipeline import StageStats
+from backend.audio_capture import MicStream, SAMPLE_RATE
+from backend.wake_word import WakeWordSpotter
+from backend import intents
 
-API_BASE = "http://127.0.0.1:5000/api"
+# words the local engines are allowed to hear, besides song titles
+COMMAND_PHRASES = ["kiki"] + intents.matcher.phrases() + ["first song", "last song", "random song"]
 
 listening = False
 voice_enabled = False   # 🔥 NEW FLAG
+voice_status = {"active": False}   # shared with /api/voice_status
+backend = None          # SpeechBackend picked at start_voice()
+mic = None              # always-open MicStream while listening
+spotter = None          # local "kiki" spotter, None = look for it in the text
+MIN_COMMAND_SECONDS = 0.3   # less audio than this after "kiki" is just the wake word
+recognize_stats = StageStats()   # utterance -> text, per backend call
+_listeners = []         # fn(active) whenever voice_status["active"] flips
+
+
+def subscribe(fn):
+    # fn(active) runs on whichever thread flipped the state; keep it short
+    _listeners.append(fn)
+
+
+def set_active(active):
+    active = bool(active)
+    if voice_status["active"] == active:
+        return
+    voice_status["active"] = active
+    for fn in list(_listeners):
+        try:
+            fn(active)
+        except Exception as e:
+            print("Voice listener error:", e)
+
+
+def send_command(command, **args):
+    # publish straight to the player, no HTTP loopback
+    bus.publish(command, source="voice", **args)
 
 
 def play_song_by_name(name):
-    try:
-        requests.post(
-            f"{API_BASE}/play_by_name",
-            json={"name": name}
-        )
-        print("🎵 Playing:", name)
-    except Exception as e:
-        print("Song play error:", e)
+    send_command(cb.PLAY_BY_NAME, name=name)
+    print("🎵 Playing:", name)
 
 
 
 def voice_callback(command):
+    # one pass over the compiled grammar instead of an ordered if-chain;
+    # add commands in intents.GRAMMAR, not here
     global voice_enabled
-    command = command.lower()
+    found = intents.match(command)
+    if found is None:
+        return
+    intent, slots = found
 
     # STOP LISTENING
-    if "stop listening" in command or "voice off" in command:
+    if intent == intents.VOICE_OFF:
         voice_enabled = False
-        requests.post(f"{API_BASE}/voice_inactive")
-        requests.post(f"{API_BASE}/pause")
+        set_active(False)
+        send_command(cb.PAUSE)
         print("Voice commands stopped")
         return
 
@@ -37,89 +72,55 @@ def voice_callback(command):
         return
 
     try:
-        # ========== PRIORITY 1 : SPOTIFY ==========
-        if "spotify next" in command:
-            requests.post(f"{API_BASE}/spotify/next")
-            print("Spotify Next")
-            return
-
-        if "spotify previous" in command or "spotify prev" in command:
-            requests.post(f"{API_BASE}/spotify/prev")
-            print("Spotify Previous")
-            return
-
-        if "spotify play" in command:
-            requests.post(f"{API_BASE}/spotify/play")
-            print("Spotify Play")
-            return
-
-        if "spotify stop" in command:
-            requests.post(f"{API_BASE}/spotify/stop")
-            print("Spotify Stop")
-            return
-
-
-        # ========== PRIORITY 2 : LOCAL CONTROLS ==========
-
-        if "next song" in command or command.strip() == "next":
-            requests.post(f"{API_BASE}/next")
-            print("Local Next")
-            return
-
-        if "previous song" in command or "prev" in command:
-            requests.post(f"{API_BASE}/prev")
-            print("Local Previous")
-            return
-
-        if "pause song" in command or "stop" in command or command.strip() == "pause":
-            requests.post(f"{API_BASE}/pause")
-            print("Local Pause")
-            return
-
-
-        # ========== PRIORITY 3 : SONG NAME ==========
-        if "play" in command:
-            name = command.replace("play", "").strip()
-
-            # agar user ne sirf “play” bola
-            if not name:
-                requests.post(f"{API_BASE}/play")
-                return
-
+        if intent == cb.PLAY_BY_NAME:
             # 👉 SMART NAME API
-            requests.post(
-                f"{API_BASE}/play_by_name",
-                json={"name": name}
-            )
-            print("🎵 Playing:", name)
+            play_song_by_name(slots["name"])
+            return
+        send_command(intent)
+        print("Voice:", intent, slots.get("target", ""))
 
     except Exception as e:
-        print("Voice API error:", e)
+        print("Voice command error:", e)
 
 
 
 def voice_loop():
+    # One mic stream for the whole session: the VAD cuts each utterance as
+    # soon as speech ends and only voiced audio reaches the recognizer.
+    # Speech that arrives while a previous one is being recognized waits
+    # in the ring buffer instead of being lost.
     global listening, voice_enabled
 
-    recognizer = sr.Recognizer()
-    mic = sr.Microphone()
-
-    print("🎤 Voice Control Active")
+    print("🎤 Voice Control Active, backend:", backend.name)
     print("Say: player play sitaare, player next song, player spotify play")
 
-    while listening:
+    for pcm, _, woke in mic.utterances():
+        if not listening:
+            break
         try:
-            with mic as source:
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio = recognizer.listen(source, phrase_time_limit=4)
+            if woke:
+                # the spotter already heard "kiki"; pcm is what came after it
+                voice_enabled = True
+                set_active(True)
+                if len(pcm) < MIN_COMMAND_SECONDS * SAMPLE_RATE * 2:
+                    continue
 
-            text = recognizer.recognize_google(audio).lower()
+            audio = sr.AudioData(pcm, SAMPLE_RATE, 2)
+
+            t0 = time.perf_counter()
+            try:
+                text = backend.transcribe(audio)
+            finally:
+                recognize_stats.record(time.perf_counter() - t0)
             print("Heard:", text)
 
+            if woke:
+                voice_callback(text.replace("kiki", "").strip())
+
             # ✅ Wake word + command in SAME sentence
-            if "kiki" in text:
+            elif "kiki" in text:
                 voice_enabled = True
-                requests.post(f"{API_BASE}/voice_active")
+                set_active(True)
 
                 command = text.replace("kiki", "").strip()
 
@@ -133,20 +134,59 @@ def voice_loop():
         except Exception:
             continue
 
-def start_voice():
-    global listening
+def start_voice(backend_name=None, vocabulary=()):
+    # backend_name: "google" (default / VOICE_BACKEND), "vosk", "sphinx", "stub"
+    # vocabulary: song titles, so grammar-constrained engines can hear them
+    # raises RuntimeError when no backend or no microphone could be opened
+    global listening, backend, mic, spotter
     if listening:
         return
+    try:
+        backend = create_backend(backend_name)
+    except Exception as e:
+        print("Speech backend unavailable, using google:", e)
+        try:
+            backend = create_backend("google")
+        except Exception as e:
+            raise RuntimeError(f"no speech backend: {e}") from e
+    backend.set_vocabulary(COMMAND_PHRASES + list(vocabulary))
+    recognize_stats.reset()
+    # enrolled templates (python -m backend.wake_word enroll ...) turn on
+    # local gating; without them every utterance is sent to the backend
+    spotter = WakeWordSpotter.load()
+    mic = MicStream(spotter=spotter)
+    try:
+        mic.start()
+    except Exception as e:
+        print("Microphone error:", e)
+        try:
+            mic.stop()      # a half-opened stream still holds the device
+        except Exception:
+            pass
+        mic = None
+        raise RuntimeError(f"microphone unavailable: {e}") from e
     listening = True
     print("🎤 Voice STARTED") 
     threading.Thread(target=voice_loop, daemon=True).start()
 
 
 
+def voice_stats():
+    return {
+        "backend": backend.name if backend else None,
+        "listening": listening,
+        "recognize": recognize_stats.snapshot(),
+        "mic": mic.stats() if mic else None,
+    }
+
+
 def stop_voice():
-    global listening
+    global listening, voice_enabled, mic
     listening = False
     voice_enabled = False
+    if mic is not None:
+        mic.stop()
+        mic = None
     print("🛑 Voice COMPLETELY STOPPED")
 
 
@@ -0,0 +1,278 @@
+# backend/wake_word.py
+#
+# On-device "kiki" spotter: log-mel features + template matching with a
+# subsequence DTW, cheap enough to run on every audio frame.
+#
+#   python -m backend.wake_word enroll kiki_1.wav kiki_2.wav ...
+#   python -m backend.wake_word eval --positives pos/ --negatives neg/
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import wave
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# ---------------- CONFIG ----------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_PATH = os.environ.get("WAKE_TEMPLATES", os.path.join(BASE_DIR, "wake_templates.npz"))
+SAMPLE_RATE = 16000
+WIN = 400                 # 25 ms analysis window
+HOP = 160                 # 10 ms hop
+N_FFT = 512
+N_MELS = 26
+WINDOW_FRAMES = 150       # 1.5 s of features searched for the wake word
+CHECK_EVERY = 10          # run the matcher every 100 ms of audio
+THRESHOLD = 0.35          # mean cosine distance along the best path
+
+
+def _mel_filterbank(rate=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS):
+    def hz_to_mel(f):
+        return 2595 * np.log10(1 + f / 700.0)
+
+    def mel_to_hz(m):
+        return 700 * (10 ** (m / 2595.0) - 1)
+
+    mels = np.linspace(hz_to_mel(60), hz_to_mel(rate / 2 * 0.95), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mels) / rate).astype(int)
+    fb = np.zeros((n_mels, n_fft // 2 + 1), np.float32)
+    for m in range(1, n_mels + 1):
+        lo, mid, hi = bins[m - 1], bins[m], bins[m + 1]
+        if mid > lo:
+            fb[m - 1, lo:mid] = (np.arange(lo, mid) - lo) / (mid - lo)
+        if hi > mid:
+            fb[m - 1, mid:hi] = (hi - np.arange(mid, hi)) / (hi - mid)
+    return fb
+
+
+MEL_FB = _mel_filterbank()
+WINDOW_FN = np.hamming(WIN).astype(np.float32)
+
+
+def log_mel(samples):
+    # int16/float samples -> (frames, N_MELS) log-mel energies
+    x = np.asarray(samples, np.float32)
+    if len(x) < WIN:
+        return np.zeros((0, N_MELS), np.float32)
+    n = 1 + (len(x) - WIN) // HOP
+    idx = np.arange(WIN)[None, :] + HOP * np.arange(n)[:, None]
+    frames = x[idx] * WINDOW_FN
+    power = np.abs(np.fft.rfft(frames, N_FFT)) ** 2
+    return np.log(power @ MEL_FB.T + 1e-6).astype(np.float32)
+
+
+def normalize(features):
+    # Remove each frame's mean level, keep its spectral shape: loudness and
+    # mic gain drop out without depending on what surrounds the word.
+    # Unit length per frame, so cosine similarity is a dot product.
+    f = features - features.mean(axis=1, keepdims=True)
+    return f / (np.linalg.norm(f, axis=1, keepdims=True) + 1e-6)
+
+
+def subsequence_dtw(template, window):
+    # Best match of `template` anywhere inside `window`, both normalised.
+    # Step pattern (1,1), (1,2), (2,1) keeps every row depending only on the
+    # two rows before it, so each template frame is one vectorised numpy
+    # step over the whole window. Returns (cost per template frame, end index).
+    cost = 1.0 - template @ window.T                  # cosine distance
+    n, m = cost.shape
+    inf = np.float32(np.inf)
+    prev2 = np.full(m, inf, np.float32)
+    prev = cost[0].copy()                             # free start anywhere
+    for i in range(1, n):
+        best = np.full(m, inf, np.float32)
+        best[1:] = prev[:-1]                          # (1,1)
+        best[2:] = np.minimum(best[2:], prev[:-2])    # (1,2)
+        if i > 1:
+            best[1:] = np.minimum(best[1:], prev2[:-1])   # (2,1)
+        prev2, prev = prev, cost[i] + best
+    end = int(np.argmin(prev))
+    return float(prev[end]) / n, end
+
+
+class WakeWordSpotter:
+    # Streaming spotter. feed() takes raw frames of any size; while `check`
+    # is true (the VAD thinks someone is speaking) it matches the recent
+    # window against every template every CHECK_EVERY hops. A match below
+    # threshold is held until the cost stops improving, so the hit lands on
+    # the end of the word rather than on its first half. A hit returns how
+    # many samples ago the wake word ended.
+
+    def __init__(self, templates, threshold=THRESHOLD):
+        self.templates = [normalize(t) for t in templates]
+        self.threshold = threshold
+        self.reset()
+        self.checks = 0
+        self.hits = 0
+        self.cpu_s = 0.0
+
+    @classmethod
+    def load(cls, path=TEMPLATES_PATH, threshold=THRESHOLD):
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        return cls([data[k] for k in sorted(data.files)], threshold)
+
+    def reset(self):
+        self._pending = np.zeros(0, np.float32)
+        self._features = np.zeros((0, N_MELS), np.float32)
+        self._since_check = 0
+        self._fed = 0                 # samples seen, for absolute positions
+        self._candidate = None        # (cost, end sample) of a match still improving
+        self.last_cost = None
+
+    def _fire(self):
+        _, end_sample = self._candidate
+        self._candidate = None
+        self.hits += 1
+        # drop the features of the word itself so it cannot match again
+        keep = max(0, (self._fed - len(self._pending) - end_sample) // HOP)
+        self._features = self._features[len(self._features) - keep:] if keep else self._features[:0]
+        return self._fed - end_sample
+
+    def feed(self, samples, check=True):
+        t0 = time.process_time()
+        samples = np.asarray(samples, np.float32)
+        self._fed += len(samples)
+        self._pending = np.concatenate([self._pending, samples])
+        n = 0 if len(self._pending) < WIN else 1 + (len(self._pending) - WIN) // HOP
+        if n:
+            feats = log_mel(self._pending[:WIN + HOP * (n - 1)])
+            self._pending = self._pending[HOP * n:]
+            self._features = np.concatenate([self._features, feats])[-WINDOW_FRAMES:]
+            self._since_check += n
+
+        hit = None
+        if not check:
+            if self._candidate is not None:
+                hit = self._fire()      # speech ended, the word is complete
+        elif self._since_check >= CHECK_EVERY and len(self._features) >= 20:
+            self._since_check = 0
+            self.checks += 1
+            window = normalize(self._features)
+            best, end = min(subsequence_dtw(t, window) for t in self.templates)
+            self.last_cost = best
+            frames_after = len(self._features) - 1 - end
+            end_sample = self._fed - len(self._pending) - frames_after * HOP
+            if best < self.threshold and (self._candidate is None or best < self._candidate[0]):
+                self._candidate = (best, end_sample)
+            elif self._candidate is not None:
+                hit = self._fire()
+        self.cpu_s += time.process_time() - t0
+        return hit
+
+    def stats(self):
+        return {
+            "templates": len(self.templates),
+            "threshold": self.threshold,
+            "checks": self.checks,
+            "hits": self.hits,
+            "last_cost": round(self.last_cost, 3) if self.last_cost is not None else None,
+            "cpu_s": round(self.cpu_s, 3),
+        }
+
+
+# ---------------- ENROLL / EVALUATE ----------------
+def read_wav(path):
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM")
+        rate, channels = w.getframerate(), w.getnchannels()
+        x = np.frombuffer(w.readframes(w.getnframes()), np.int16).astype(np.float32)
+    if channels > 1:
+        x = x.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        t = np.arange(0, len(x) * SAMPLE_RATE // rate) * rate / SAMPLE_RATE
+        x = np.interp(t, np.arange(len(x)), x).astype(np.float32)
+    return x
+
+
+def trim_silence(x, margin_db=25.0):
+    # enrollment clips -> features of the spoken part only
+    feats = log_mel(x)
+    energy_db = 10 * np.log10(np.exp(feats).sum(axis=1))
+    voiced = np.flatnonzero(energy_db > energy_db.max() - margin_db)
+    if not len(voiced):
+        return feats
+    return feats[voiced[0]:voiced[-1] + 1]
+
+
+def enroll(paths, out=TEMPLATES_PATH):
+    templates = {f"t{i}": trim_silence(read_wav(p)) for i, p in enumerate(paths)}
+    np.savez_compressed(out, **templates)
+    return out
+
+
+def _clips(folder):
+    return sorted(glob.glob(os.path.join(folder, "*.wav"))) if folder else []
+
+
+def evaluate(spotter, positives, negatives, chunk=480):
+    # positives: clips that contain one "kiki"; negatives: clips with none
+    def run(path):
+        spotter.reset()
+        x = read_wav(path)
+        hits = 0
+        for i in range(0, len(x), chunk):
+            if spotter.feed(x[i:i + chunk]) is not None:
+                hits += 1
+        # a word right at the end of the clip is still held as a candidate
+        if spotter.feed(x[:0], check=False) is not None:
+            hits += 1
+        return hits, len(x) / SAMPLE_RATE
+
+    cpu0 = spotter.cpu_s
+    audio_s = 0.0
+    misses = 0
+    for p in positives:
+        hits, dur = run(p)
+        audio_s += dur
+        misses += hits == 0
+    false_accepts = 0
+    negative_s = 0.0
+    for p in negatives:
+        hits, dur = run(p)
+        audio_s += dur
+        negative_s += dur
+        false_accepts += hits
+    cpu = spotter.cpu_s - cpu0
+    return {
+        "positives": len(positives),
+        "negatives": len(negatives),
+        "false_reject_rate": round(misses / len(positives), 3) if positives else None,
+        "false_accepts": false_accepts,
+        "false_accepts_per_hour": round(false_accepts / (negative_s / 3600), 2) if negative_s else None,
+        "cpu_s": round(cpu, 3),
+        "realtime_factor": round(cpu / audio_s, 4) if audio_s else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wake-word templates and evaluation")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_enroll = sub.add_parser("enroll", help="build templates from recordings of the wake word")
+    p_enroll.add_argument("clips", nargs="+")
+    p_enroll.add_argument("--out", default=TEMPLATES_PATH)
+    p_eval = sub.add_parser("eval", help="false-accept / false-reject / CPU on fixtures")
+    p_eval.add_argument("--templates", default=TEMPLATES_PATH)
+    p_eval.add_argument("--positives")
+    p_eval.add_argument("--negatives")
+    p_eval.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "enroll":
+        print("templates saved:", enroll(args.clips, args.out))
+        return 0
+    spotter = WakeWordSpotter.load(args.templates, args.threshold)
+    if spotter is None:
+        print("no templates at", args.templates)
+        return 1
+    print(json.dumps(evaluate(spotter, _clips(args.positives), _clips(args.negatives)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,35 +6,70 @@ import VoiceHelp from "./VoiceHelp";
 function Dashboard() {
   const [mode, setMode] = useState("local");
   const [status, setStatus] = useState("Stopped");
-  const [songs, setSongs] = useState([]);
+  const [songs, setSongs] = useState([]);          // [{index, name}], one page at a time
+  const [nextCursor, setNextCursor] = useState(null);
+  const [query, setQuery] = useState("");
+  const [totalSongs, setTotalSongs] = useState(0);
   const [currentIndex, setCurrentIndex] = useState(0);
   const [backendState, setBackendState] = useState(null);
   const navigate = useNavigate();
 
-  useEffect(() => {
-    if (mode === "local") {
-      fetch("/api/songs")
-        .then((res) => res.json())
-        .then((data) => setSongs(data.songs || []));
-    }
-  }, [mode]);
+  // pages of PAGE_SIZE; the server filters, so typing never downloads the whole library
+  const PAGE_SIZE = 200;
+  const loadSongs = (cursor = null) => {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (query) params.set("q", query);
+    if (cursor) params.set("cursor", cursor);
+    return fetch(`/api/songs?${params}`)
+      .then((res) => res.json())
+      .then((data) => {
+        const page = data.songs || [];
+        setSongs((prev) => (cursor ? [...prev, ...page] : page));
+        setNextCursor(data.next_cursor || null);
+        setTotalSongs(data.total || 0);
+      })
+      .catch((err) => console.log(err));
+  };
 
   useEffect(() => {
-    const interval = setInterval(() => {
-    fetch("/api/state")
-      .then(res => res.json())
-      .then(data => {
+    if (mode !== "local") return;
+    const t = setTimeout(() => loadSongs(), 250);   // debounce search typing
+    return () => clearTimeout(t);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [mode, query]);
 
-        setBackendState(data);          // 🔥 MISSING THA
-        setCurrentIndex(data.current_index);
-        setStatus(data.status);         // 🔥 STATUS BHI UPDATE
-        setMode(data.mode);
-
-      })
-      .catch(err => console.log(err));
-  }, 1000);
-
-  return () => clearInterval(interval);
+  useEffect(() => {
+    const apply = (data) => {
+      setBackendState(data);          // 🔥 MISSING THA
+      setCurrentIndex(data.current_index);
+      setStatus(data.status);         // 🔥 STATUS BHI UPDATE
+      setMode(data.mode);
+    };
+
+    // server pushes every change (commands, track end, auto-advance);
+    // fall back to slow polling only if the event stream is unavailable
+    let interval = null;
+    const source = new EventSource("/api/events");
+    const onMessage = (e) => apply(JSON.parse(e.data));
+    ["state", "track", "ended"].forEach((name) => source.addEventListener(name, onMessage));
+    source.onopen = () => {
+      clearInterval(interval);
+      interval = null;
+    };
+    source.onerror = () => {
+      if (interval) return;
+      interval = setInterval(() => {
+        fetch("/api/state")
+          .then(res => res.json())
+          .then(apply)
+          .catch(err => console.log(err));
+      }, 5000);
+    };
+
+    return () => {
+      source.close();
+      clearInterval(interval);
+    };
   }, []);
   const playSelectedSong = (index) => {
     fetch("/api/play_index", {
@@ -131,6 +166,23 @@ function Dashboard() {
       <div className="glass" style={{ marginTop: 15 }}>
         <h3>Local Songs</h3>
 
+        <input
+          type="text"
+          placeholder="Search songs..."
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          style={{
+            width: "100%",
+            padding: "10px",
+            marginBottom: "10px",
+            borderRadius: "10px",
+            background: "#111",
+            color: "white",
+            border: "1px solid #444",
+            boxSizing: "border-box"
+          }}
+        />
+
         <select
           value={currentIndex}
           onChange={(e) => playSelectedSong(Number(e.target.value))}
@@ -148,13 +200,22 @@ function Dashboard() {
             -- Select Song --
           </option>
 
-          {songs.map((s, i) => (
-            <option key={i} value={i}>
-              {i === currentIndex ? "▶ " : ""} {s}
+          {songs.map((s) => (
+            <option key={s.index} value={s.index}>
+              {s.index === currentIndex ? "▶ " : ""} {s.name}
             </option>
           ))}
         </select>
 
+        <div style={{ marginTop: 10 }}>
+          {songs.length} / {totalSongs} songs
+          {nextCursor && (
+            <button className="btn" style={{ marginLeft: 10 }} onClick={() => loadSongs(nextCursor)}>
+              Load more
+            </button>
+          )}
+        </div>
+
       </div>
     )}
     <VoiceHelp/>
@@ -62,9 +62,24 @@ songs= [
   },
 ]
 
+# Cloudinary transcodes a transformation on first request and keeps the
+# derived file on its CDN, so ?quality=low is just a bitrate in the URL
+QUALITY_BITRATES = {"low": "br_64k", "medium": "br_128k"}
+
+def variant_url(url, quality):
+    bitrate = QUALITY_BITRATES.get(quality)
+    if not bitrate or "/upload/" not in url:
+        return url
+    return url.replace("/upload/", f"/upload/{bitrate}/", 1)
+
 @app.route("/api/songs")
 def get_songs():
     player.songs = songs
+    quality = request.args.get("quality")
+    if quality:
+        if quality not in QUALITY_BITRATES:
+            return jsonify({"error": "quality must be one of " + ", ".join(QUALITY_BITRATES)}), 400
+        return jsonify([dict(song, url=variant_url(song["url"], quality)) for song in songs])
     return jsonify(songs)
 # ---------------- PLAYER ----------------
 class DummyPlayer: